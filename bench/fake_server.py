@@ -0,0 +1,328 @@
+"""
+Servidor local que imita a API do Mercado Livre, o Bot API do Telegram, a
+Graph API do WhatsApp Cloud e a chamada de backend do Link Builder, para
+medir o pipeline sem tocar nos serviços reais.
+
+Uso isolado:
+  python bench/fake_server.py --port 8765 --latency-ms 80 --error-rate 0.02
+Gravar fixtures a partir da API real (para depois reproduzir):
+  python bench/fake_server.py --record MLB1051,MLB1648 --out bench/fixtures
+"""
+import argparse
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+import urllib.parse
+import urllib.request
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Dict, List, Optional
+
+# Não é uma imagem válida: só o tamanho/cabeçalho importam para o download
+FAKE_JPG = b"\xff\xd8\xff\xe0" + bytes(8 * 1024) + b"\xff\xd9"
+
+# Rota que faz o papel do backend do Link Builder (modelo da chamada em link_builder_model)
+LINK_BUILDER_PATH = "/afiliados/api/linkbuilder/meli"
+
+
+def link_builder_model(base_url: str) -> Dict:
+    """Modelo de requisição (formato de linkbuilder_http) apontando para este servidor."""
+    return {
+        "method": "POST",
+        "url": f"{base_url}{LINK_BUILDER_PATH}",
+        "headers": {"Content-Type": "application/json", "X-Csrf-Token": "bench"},
+        "body": '{"urls":["{{URL}}"],"tag":"bench"}',
+        "codificacao": "json",
+    }
+
+
+def synthetic_items(categories: List[str], per_category: int, seed: int = 42) -> List[Dict]:
+    """Itens no formato de /items/{id} quando não há fixture gravada."""
+    rnd = random.Random(seed)
+    items = []
+    n = 4000000000
+    for cat in categories:
+        for i in range(per_category):
+            n += 1
+            price = round(rnd.uniform(10, 2000), 2)
+            original = round(price * rnd.uniform(1.0, 1.6), 2) if rnd.random() < 0.7 else None
+            items.append({
+                "id": f"MLB{n}",
+                "category_id": cat,
+                "title": f"Produto de teste {i + 1} ({cat})",
+                "price": price,
+                "original_price": original,
+                "currency_id": "BRL",
+                "sold_quantity": rnd.randint(0, 5000),
+                "thumbnail": "",
+                "pictures": [{"url": ""}],
+                "permalink": "",
+            })
+    return items
+
+
+def load_fixture_items(fixtures_dir: Path) -> List[Dict]:
+    return json.loads((fixtures_dir / "items.json").read_text(encoding="utf-8"))
+
+
+class FakeBackend:
+    def __init__(self, items: List[Dict], latency_ms: float = 0, jitter_ms: float = 0,
+                 error_rate: float = 0.0, throttle_rate: float = 0.0, seed: int = 7):
+        self.items = {it["id"]: it for it in items}
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self.counters: Counter = Counter()
+        self.base_url = ""
+        self._rnd = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def _roll(self) -> float:
+        with self._lock:
+            return self._rnd.random()
+
+    def delay(self) -> None:
+        jitter = self.jitter_ms * self._roll() if self.jitter_ms else 0
+        if self.latency_ms or jitter:
+            time.sleep((self.latency_ms + jitter) / 1000)
+
+    def fault(self) -> Optional[int]:
+        roll = self._roll()
+        if roll < self.throttle_rate:
+            return 429
+        if roll < self.throttle_rate + self.error_rate:
+            return 503
+        return None
+
+    def count(self, route: str) -> None:
+        with self._lock:
+            self.counters[route] += 1
+
+    def public_item(self, item: Dict) -> Dict:
+        """Aponta permalink e imagens para este servidor."""
+        body = dict(item)
+        img = f"{self.base_url}/img/{hashlib.sha1(item['id'].encode()).hexdigest()[:12]}.jpg"
+        body["permalink"] = f"{self.base_url}/produto/{item['id']}"
+        body["thumbnail"] = img
+        body["pictures"] = [{"url": img}]
+        return body
+
+    def search(self, query: Dict[str, str]) -> Dict:
+        cat = query.get("category")
+        q = (query.get("q") or "").lower()
+        hits = [it for it in self.items.values()
+                if (not cat or it.get("category_id") == cat)
+                and (not q or any(w in it.get("title", "").lower() for w in q.split()))]
+        if query.get("sort") == "sold_quantity_desc":
+            hits.sort(key=lambda it: it.get("sold_quantity", 0), reverse=True)
+        offset = int(query.get("offset", 0))
+        limit = int(query.get("limit", 50))
+        page = hits[offset:offset + limit]
+        return {
+            "paging": {"total": len(hits), "offset": offset, "limit": limit},
+            "results": [self.public_item(it) for it in page],
+        }
+
+    def short_links(self, urls: List[str]) -> Dict:
+        return {"urls": [
+            {"origin_url": u, "short_url": f"https://mercadolivre.com/sec/{hashlib.sha1(u.encode()).hexdigest()[:8]}"}
+            for u in urls
+        ]}
+
+    def multiget(self, ids: List[str], attributes: Optional[List[str]]) -> List[Dict]:
+        out = []
+        for item_id in ids:
+            item = self.items.get(item_id)
+            if not item:
+                out.append({"code": 404, "body": {"id": item_id, "error": "not_found"}})
+                continue
+            body = self.public_item(item)
+            if attributes:
+                body = {k: v for k, v in body.items() if k in attributes}
+            out.append({"code": 200, "body": body})
+        return out
+
+
+def make_handler(backend: FakeBackend):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        # Keep-alive com cabeçalho e corpo em writes separados: sem isso o
+        # Nagle + ACK atrasado somam ~40 ms a cada requisição
+        disable_nagle_algorithm = True
+
+        def log_message(self, *args):
+            pass
+
+        def _send(self, status: int, payload, content_type: str = "application/json", headers=None):
+            if isinstance(payload, (bytes, bytearray)):
+                body = bytes(payload)
+            elif isinstance(payload, str):
+                body = payload.encode("utf-8")
+            else:
+                body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            for k, v in (headers or {}).items():
+                self.send_header(k, v)
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _fault(self) -> bool:
+            status = backend.fault()
+            if status is None:
+                return False
+            backend.count(f"fault_{status}")
+            headers = {"Retry-After": "1"} if status == 429 else None
+            self._send(status, {"error": "fake_fault", "status": status}, headers=headers)
+            return True
+
+        def do_GET(self):
+            parsed = urllib.parse.urlparse(self.path)
+            query = {k: v[-1] for k, v in urllib.parse.parse_qs(parsed.query).items()}
+            path = parsed.path
+            backend.delay()
+
+            if path == "/sites/MLB/search":
+                backend.count("ml_search")
+                if not self._fault():
+                    self._send(200, backend.search(query))
+            elif path == "/items":
+                backend.count("ml_multiget")
+                if not self._fault():
+                    ids = [i for i in query.get("ids", "").split(",") if i]
+                    attrs = [a for a in query.get("attributes", "").split(",") if a] or None
+                    self._send(200, backend.multiget(ids, attrs))
+            elif path.startswith("/items/"):
+                backend.count("ml_item")
+                if not self._fault():
+                    item = backend.items.get(path.rsplit("/", 1)[-1])
+                    if item:
+                        self._send(200, backend.public_item(item))
+                    else:
+                        self._send(404, {"error": "not_found"})
+            elif path.startswith("/img/"):
+                backend.count("image")
+                self._send(200, FAKE_JPG, content_type="image/jpeg")
+            elif path.startswith("/produto/"):
+                backend.count("product_page")
+                item = backend.items.get(path.rsplit("/", 1)[-1])
+                if not item:
+                    self._send(404, "<html></html>", content_type="text/html")
+                    return
+                body = backend.public_item(item)
+                html = (
+                    "<html><head>"
+                    f'<meta property="og:image" content="{body["thumbnail"]}">'
+                    "</head><body>"
+                    f'<h1 class="ui-pdp-title">{body["title"]}</h1>'
+                    f'<span class="andes-money-amount__fraction">{int(body["price"])}</span>'
+                    "</body></html>"
+                )
+                self._send(200, html, content_type="text/html; charset=utf-8")
+            else:
+                self._send(404, {"error": "unknown_route", "path": path})
+
+        def do_POST(self):
+            length = int(self.headers.get("Content-Length") or 0)
+            raw = self.rfile.read(length) if length else b""
+            path = urllib.parse.urlparse(self.path).path
+            backend.delay()
+
+            if re.fullmatch(r"/bot[^/]+/send(Message|Photo)", path):
+                backend.count("telegram")
+                if not self._fault():
+                    self._send(200, {"ok": True, "result": {"message_id": backend.counters["telegram"]}})
+            elif re.fullmatch(r"/v\d+\.\d+/[^/]+/messages", path):
+                backend.count("whatsapp_cloud")
+                if not self._fault():
+                    self._send(200, {"messaging_product": "whatsapp",
+                                     "messages": [{"id": f"wamid.{backend.counters['whatsapp_cloud']}"}]})
+            elif path == LINK_BUILDER_PATH:
+                backend.count("linkbuilder")
+                if "ssid=" not in (self.headers.get("Cookie") or ""):
+                    self._send(401, {"error": "not_logged_in"})
+                elif not self._fault():
+                    try:
+                        urls = json.loads(raw or b"{}").get("urls") or []
+                    except ValueError:
+                        urls = []
+                    self._send(200, backend.short_links(urls))
+            elif path == "/oauth/token":
+                backend.count("ml_oauth")
+                self._send(200, {"access_token": "fake", "expires_in": 21600})
+            else:
+                self._send(404, {"error": "unknown_route", "path": path})
+
+    return Handler
+
+
+def start_server(backend: FakeBackend, host: str = "127.0.0.1", port: int = 0) -> ThreadingHTTPServer:
+    """Sobe o servidor numa thread daemon e devolve a instância (porta em server_address)."""
+    server = ThreadingHTTPServer((host, port), make_handler(backend))
+    server.daemon_threads = True
+    backend.base_url = f"http://{host}:{server.server_address[1]}"
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def record_fixtures(categories: List[str], out_dir: Path, per_category: int = 50) -> None:
+    """Grava items.json a partir da API real (busca por categoria + multiget)."""
+    base = "https://api.mercadolibre.com"
+    items: Dict[str, Dict] = {}
+    for cat in categories:
+        url = f"{base}/sites/MLB/search?" + urllib.parse.urlencode(
+            {"category": cat, "sort": "sold_quantity_desc", "limit": per_category})
+        with urllib.request.urlopen(url, timeout=20) as resp:
+            results = json.load(resp).get("results", [])
+        ids = [r["id"] for r in results]
+        for start in range(0, len(ids), 20):
+            chunk = ",".join(ids[start:start + 20])
+            with urllib.request.urlopen(f"{base}/items?ids={chunk}", timeout=20) as resp:
+                for entry in json.load(resp):
+                    body = entry.get("body") or {}
+                    if entry.get("code") == 200 and body.get("id"):
+                        body["category_id"] = cat
+                        items[body["id"]] = body
+        print(f"[BENCH] {cat}: {len(ids)} itens gravados")
+    out_dir.mkdir(parents=True, exist_ok=True)
+    (out_dir / "items.json").write_text(json.dumps(list(items.values()), ensure_ascii=False), encoding="utf-8")
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--port", type=int, default=8765)
+    ap.add_argument("--fixtures", type=Path)
+    ap.add_argument("--categories", default="MLB1051,MLB1648")
+    ap.add_argument("--items-per-category", type=int, default=50)
+    ap.add_argument("--latency-ms", type=float, default=0)
+    ap.add_argument("--jitter-ms", type=float, default=0)
+    ap.add_argument("--error-rate", type=float, default=0)
+    ap.add_argument("--throttle-rate", type=float, default=0)
+    ap.add_argument("--record", help="categorias para gravar da API real")
+    ap.add_argument("--out", type=Path, default=Path(__file__).resolve().parent / "fixtures")
+    args = ap.parse_args()
+
+    if args.record:
+        record_fixtures([c for c in args.record.split(",") if c], args.out, args.items_per_category)
+        return
+
+    cats = [c for c in args.categories.split(",") if c]
+    items = load_fixture_items(args.fixtures) if args.fixtures else synthetic_items(cats, args.items_per_category)
+    backend = FakeBackend(items, args.latency_ms, args.jitter_ms, args.error_rate, args.throttle_rate)
+    server = start_server(backend, port=args.port)
+    print(f"[BENCH] Servidor falso em {backend.base_url} ({len(items)} itens). Ctrl+C para sair.")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
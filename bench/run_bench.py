@@ -0,0 +1,305 @@
+"""
+Benchmark de ponta a ponta contra o servidor falso (bench/fake_server.py).
+
+Roda cada cenário num subprocesso próprio (para o pico de RSS ser dele) e
+mede ofertas/minuto e latência p50/p99 por etapa:
+  - main    : main.build_and_publish (Link Builder substituído por um stub offline)
+  - horaria : bot.enviar_oferta_horaria, uma rodada por "hora"
+  - postar  : postar_oferta_whatsapp.postar_oferta_whatsapp com link já pronto
+  - links   : linkbuilder_http.LinkBuilderHTTP (replay da chamada do Link Builder), em paralelo
+
+Exemplo:
+  python bench/run_bench.py --latency-ms 60 --jitter-ms 40 --error-rate 0.02 --out bench_result.json
+"""
+import argparse
+import functools
+import importlib
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from pathlib import Path
+from typing import Callable, Dict, List
+
+BENCH_DIR = Path(__file__).resolve().parent
+PKG_DIR = BENCH_DIR.parent
+
+sys.path.insert(0, str(BENCH_DIR))
+from fake_server import (  # noqa: E402
+    FakeBackend, link_builder_model, load_fixture_items, start_server, synthetic_items,
+)
+
+SCENARIOS = ["main", "horaria", "postar", "links"]
+
+
+# ============================================================
+# MEDIÇÃO (lado do subprocesso)
+# ============================================================
+
+class StageTimer:
+    def __init__(self):
+        self.samples: Dict[str, List[float]] = defaultdict(list)
+        self.offers = 0
+
+    def wrap(self, stage: str, fn: Callable) -> Callable:
+        @functools.wraps(fn)
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                self.samples[stage].append(time.perf_counter() - start)
+        return timed
+
+    def patch(self, module, name: str, stage: str) -> None:
+        setattr(module, name, self.wrap(stage, getattr(module, name)))
+
+
+def _percentile(values: List[float], pct: float) -> float:
+    ordered = sorted(values)
+    idx = min(len(ordered) - 1, max(0, round(pct / 100 * (len(ordered) - 1))))
+    return ordered[idx]
+
+
+class OfflineLinkBuilder:
+    """Substitui o Link Builder (Selenium) por um atraso fixo configurável."""
+
+    def __init__(self, *args, **kwargs):
+        self.delay = float(os.getenv("BENCH_LINK_MS", "0")) / 1000
+
+    def ensure_logged_in(self):
+        pass
+
+    def build_affiliate(self, url: str, permalink=None) -> str:
+        if self.delay:
+            time.sleep(self.delay)
+        return f"{url}?aff=bench"
+
+    def close(self):
+        pass
+
+
+def _run_main(timer: StageTimer) -> None:
+    sys.path.insert(0, str(PKG_DIR.parent))
+    pkg = PKG_DIR.name
+    lbs = importlib.import_module(f"{pkg}.linkbuilder_selenium")
+    lbs.LinkBuilder = OfflineLinkBuilder
+    main = importlib.import_module(f"{pkg}.main")
+    main.LinkBuilder = OfflineLinkBuilder
+
+    timer.patch(main, "top_sellers_by_category", "search")
+    timer.patch(main, "get_items_details", "details")
+    timer.patch(main, "download_image", "media")
+    timer.patch(main, "format_offer", "format")
+    timer.patch(main.x_poster, "export_to_csv", "export")
+    OfflineLinkBuilder.build_affiliate = timer.wrap("link", OfflineLinkBuilder.build_affiliate)
+
+    send_photo = timer.wrap("telegram", main.tg.send_photo)
+    send_message = timer.wrap("telegram", main.tg.send_message)
+
+    def count_photo(*args, **kwargs):
+        send_photo(*args, **kwargs)
+        timer.offers += 1
+
+    def count_message(*args, **kwargs):
+        send_message(*args, **kwargs)
+        timer.offers += 1
+
+    main.tg.send_photo = count_photo
+    main.tg.send_message = count_message
+    main.build_and_publish()
+
+
+def _run_horaria(timer: StageTimer) -> None:
+    sys.path.insert(0, str(PKG_DIR))
+    bot = importlib.import_module("bot")
+    timer.patch(bot, "buscar_produtos", "search")
+    timer.patch(bot, "enviar_whats", "whatsapp")
+    montar = bot.montar_mensagem
+
+    def montar_contando(titulo, produtos):
+        timer.offers += len(produtos)
+        return montar(titulo, produtos)
+
+    bot.montar_mensagem = timer.wrap("format", montar_contando)
+    for hora in range(int(os.getenv("BENCH_ROUNDS", "6"))):
+        bot.enviar_oferta_horaria(hora)
+
+
+def _run_postar(timer: StageTimer) -> None:
+    sys.path.insert(0, str(PKG_DIR))
+    postar = importlib.import_module("postar_oferta_whatsapp")
+    timer.patch(postar, "extrair_dados_produto", "scrape")
+    timer.patch(postar, "montar_texto_oferta", "format")
+    timer.patch(postar, "enviar_whatsapp_imagem", "whatsapp")
+    timer.patch(postar, "enviar_whatsapp_texto", "whatsapp")
+
+    base = os.environ["BENCH_BASE_URL"]
+    for item_id in os.environ["BENCH_ITEM_IDS"].split(","):
+        url = f"{base}/produto/{item_id}"
+        postar.postar_oferta_whatsapp(url, link_afiliado=f"{url}?aff=bench")
+        timer.offers += 1
+
+
+def _run_links(timer: StageTimer) -> None:
+    sys.path.insert(0, str(PKG_DIR))
+    linkbuilder_http = importlib.import_module("linkbuilder_http")
+    base = os.environ["BENCH_BASE_URL"]
+    gerador = linkbuilder_http.LinkBuilderHTTP(
+        modelo=link_builder_model(base), cookies={"ssid": "bench"}, path=Path("linkbuilder_request.json"),
+    )
+    gerador.gerar = timer.wrap("link", gerador.gerar)
+
+    urls = [f"{base}/produto/{item_id}" for item_id in os.environ["BENCH_ITEM_IDS"].split(",")]
+    links = gerador.gerar_muitos(urls)
+    timer.offers += sum(1 for link in links.values() if link)
+
+
+RUNNERS = {"main": _run_main, "horaria": _run_horaria, "postar": _run_postar, "links": _run_links}
+
+
+def run_scenario_child(name: str) -> Dict:
+    timer = StageTimer()
+    start = time.perf_counter()
+    error = None
+    try:
+        RUNNERS[name](timer)
+    except BaseException as e:  # SystemExit também conta como falha do cenário
+        error = f"{type(e).__name__}: {e}"
+    elapsed = time.perf_counter() - start
+    return {
+        "scenario": name,
+        "elapsed_s": round(elapsed, 3),
+        "offers": timer.offers,
+        "offers_per_min": round(timer.offers / elapsed * 60, 2) if elapsed > 0 else 0.0,
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        "stages": {
+            stage: {
+                "calls": len(v),
+                "p50_ms": round(_percentile(v, 50) * 1000, 2),
+                "p99_ms": round(_percentile(v, 99) * 1000, 2),
+                "total_ms": round(sum(v) * 1000, 1),
+            }
+            for stage, v in timer.samples.items()
+        },
+        "error": error,
+    }
+
+
+# ============================================================
+# ORQUESTRAÇÃO (processo pai)
+# ============================================================
+
+def _scenario_env(base_url: str, workdir: Path, args, categories: List[str], item_ids: List[str]) -> Dict[str, str]:
+    env = dict(os.environ)
+    env.update({
+        "ML_API_BASE": base_url,
+        "TELEGRAM_API_BASE": base_url,
+        "WHATSAPP_GRAPH_BASE": base_url,
+        "ML_CATEGORIES": ",".join(categories),
+        "CATEGORIES": "|".join(f"Produto {c}" for c in categories),
+        "TOP_N": str(args.top_n),
+        "TELEGRAM_BOT_TOKEN": "bench",
+        "TELEGRAM_CHAT_ID": "1",
+        "WHATSAPP_NUMBER": "",
+        "DRY_RUN": "false",
+        "DOWNLOAD_IMAGES": "true",
+        "MODO_TESTE_SECO": "false",
+        "WHATS_DESTINO": "5500000000000",
+        "WHATSAPP_TOKEN": "bench",
+        "WHATSAPP_PHONE_NUMBER_ID": "1",
+        "SEEN_PATH": str(workdir / "seen.json"),
+        "PRICE_HISTORY_PATH": str(workdir / "price_history.sqlite"),
+        "HTTP_CACHE_PATH": str(workdir / "http_cache.sqlite"),
+        "MEDIA_DIR": str(workdir / "media"),
+        "EXPORT_PATH": str(workdir / "ml_offers.csv"),
+        "BENCH_BASE_URL": base_url,
+        "BENCH_ITEM_IDS": ",".join(item_ids),
+        "BENCH_LINK_MS": str(args.link_ms),
+        "BENCH_ROUNDS": str(args.rounds),
+    })
+    return env
+
+
+def _print_report(results: List[Dict]) -> None:
+    for r in results:
+        print(f"\n=== {r['scenario']} ===")
+        if r.get("error"):
+            print(f"  ERRO: {r['error']}")
+        print(f"  ofertas: {r['offers']} em {r['elapsed_s']}s -> {r['offers_per_min']} ofertas/min")
+        print(f"  pico de RSS: {r['peak_rss_mb']} MB")
+        print(f"  {'etapa':<10} {'chamadas':>8} {'p50 ms':>10} {'p99 ms':>10} {'total ms':>10}")
+        for stage, s in sorted(r["stages"].items(), key=lambda kv: -kv[1]["total_ms"]):
+            print(f"  {stage:<10} {s['calls']:>8} {s['p50_ms']:>10} {s['p99_ms']:>10} {s['total_ms']:>10}")
+        if r.get("server"):
+            print(f"  servidor: {r['server']}")
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--scenarios", default=",".join(SCENARIOS))
+    ap.add_argument("--fixtures", type=Path, help="diretório com items.json gravado")
+    ap.add_argument("--categories", type=int, default=10, help="categorias sintéticas (sem fixtures)")
+    ap.add_argument("--items-per-category", type=int, default=50)
+    ap.add_argument("--top-n", type=int, default=20)
+    ap.add_argument("--rounds", type=int, default=6, help="rodadas do envio horário")
+    ap.add_argument("--postar-items", type=int, default=20)
+    ap.add_argument("--latency-ms", type=float, default=50)
+    ap.add_argument("--jitter-ms", type=float, default=30)
+    ap.add_argument("--error-rate", type=float, default=0.0)
+    ap.add_argument("--throttle-rate", type=float, default=0.0)
+    ap.add_argument("--link-ms", type=float, default=0, help="atraso simulado do Link Builder")
+    ap.add_argument("--out", type=Path, help="grava o resultado em JSON")
+    ap.add_argument("--child", help=argparse.SUPPRESS)
+    args = ap.parse_args()
+
+    if args.child:
+        print("BENCH_RESULT " + json.dumps(run_scenario_child(args.child)))
+        return
+
+    if args.fixtures:
+        items = load_fixture_items(args.fixtures)
+        categories = list(dict.fromkeys(it.get("category_id") for it in items if it.get("category_id")))
+    else:
+        categories = [f"MLB{1000 + i}" for i in range(args.categories)]
+        items = synthetic_items(categories, args.items_per_category)
+
+    backend = FakeBackend(items, args.latency_ms, args.jitter_ms, args.error_rate, args.throttle_rate)
+    server = start_server(backend)
+    item_ids = [it["id"] for it in items[:args.postar_items]]
+    print(f"[BENCH] Servidor falso em {backend.base_url} com {len(items)} itens em {len(categories)} categorias")
+
+    results = []
+    try:
+        for name in [s for s in args.scenarios.split(",") if s]:
+            before = dict(backend.counters)
+            with tempfile.TemporaryDirectory(prefix=f"bench_{name}_") as tmp:
+                env = _scenario_env(backend.base_url, Path(tmp), args, categories, item_ids)
+                proc = subprocess.run(
+                    [sys.executable, str(Path(__file__).resolve()), "--child", name],
+                    env=env, cwd=tmp, capture_output=True, text=True,
+                )
+            line = next((l for l in proc.stdout.splitlines() if l.startswith("BENCH_RESULT ")), None)
+            if line:
+                result = json.loads(line[len("BENCH_RESULT "):])
+            else:
+                result = {"scenario": name, "elapsed_s": 0, "offers": 0, "offers_per_min": 0,
+                          "peak_rss_mb": 0, "stages": {}, "error": proc.stderr.strip()[-2000:]}
+            result["server"] = {k: v - before.get(k, 0) for k, v in backend.counters.items()
+                                if v - before.get(k, 0)}
+            results.append(result)
+    finally:
+        server.shutdown()
+
+    _print_report(results)
+    if args.out:
+        args.out.write_text(json.dumps(results, indent=2, ensure_ascii=False), encoding="utf-8")
+        print(f"\n[BENCH] Resultado salvo em {args.out}")
+
+
+if __name__ == "__main__":
+    main()
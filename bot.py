@@ -1,8 +1,13 @@
 import os
 import time
-import requests
 from datetime import datetime, date
+from pathlib import Path
 import random
+import heapq
+
+import http_client
+from ml_api import iter_search_pages
+from price_history import PriceHistory
 
 # ============================================================
 # VARIÁVEIS DE AMBIENTE
@@ -12,6 +17,7 @@ MODO_TESTE_SECO = os.getenv("MODO_TESTE_SECO", "True").lower() == "true"
 WHATS_DESTINO = os.getenv("WHATS_DESTINO")
 WHATSAPP_TOKEN = os.getenv("WHATSAPP_TOKEN")
 WHATSAPP_PHONE_NUMBER_ID = os.getenv("WHATSAPP_PHONE_NUMBER_ID")
+WHATSAPP_GRAPH_BASE = os.getenv("WHATSAPP_GRAPH_BASE", "https://graph.facebook.com")
 
 # Configurações avançadas
 # Frequência de checagem do loop (segundos)
@@ -29,6 +35,13 @@ MORNING_MAX_QTD = int(os.getenv("MORNING_MAX_QTD", "5"))
 # Ofertas por disparo horário
 HOURLY_OFFERS_QTD = int(os.getenv("HOURLY_OFFERS_QTD", "3"))
 
+# Busca: quantas páginas no máximo e desconto mínimo para parar cedo
+BUSCA_MAX_PAGINAS = int(os.getenv("BUSCA_MAX_PAGINAS", "5"))
+BUSCA_MIN_DESCONTO_PCT = float(os.getenv("BUSCA_MIN_DESCONTO_PCT", "10"))
+
+# Histórico de preços (para distinguir queda real de "preço original" inflado)
+PRICE_HISTORY_PATH = os.getenv("PRICE_HISTORY_PATH", "data/price_history.sqlite")
+
 # Lista de categorias (separadas por "|")
 CATEGORIES = os.getenv(
     "CATEGORIES",
@@ -40,48 +53,84 @@ CATEGORIES = os.getenv(
 # BUSCA DE PRODUTOS NO MERCADO LIVRE
 # ============================================================
 
-def buscar_produtos(query, limit=50):
-    url = f"https://api.mercadolibre.com/sites/MLB/search?q={query}&limit={limit}"
+def _desconto_pct(item):
+    preco = item.get("price", 0)
+    preco_original = item.get("original_price") or preco
+    if preco_original:
+        return round((1 - preco / preco_original) * 100, 2)
+    return 0
+
+
+_historico_precos = None
+
+
+def _historico():
+    global _historico_precos
+    if _historico_precos is None:
+        _historico_precos = PriceHistory(Path(PRICE_HISTORY_PATH))
+    return _historico_precos
+
+
+def buscar_produtos(query, limit=50, k=10, min_desconto=BUSCA_MIN_DESCONTO_PCT, max_paginas=BUSCA_MAX_PAGINAS):
+    """
+    Percorre as páginas da busca guardando só as k maiores ofertas (heap).
+    Para de paginar assim que houver k itens com pelo menos min_desconto %.
+
+    A ordem prioriza a queda real contra o menor preço do histórico e só
+    depois o desconto anunciado.
+    """
     print(f"[INFO] Buscando produtos: {query}")
+    historico = _historico()
+
+    # heap mínimo de ((queda, desconto), -ordem, produto): o topo é o pior dos k
+    melhores = []
+    ordem = 0
+    paginas = 0
 
     try:
-        resp = requests.get(url, timeout=10)
-        if resp.status_code != 200:
-            print("[ERRO] Busca retornou:", resp.status_code)
-            print("[ERRO] Corpo:", resp.text)
+        for pagina in iter_search_pages(query, page_size=limit, max_pages=max_paginas):
+            paginas += 1
+            observacoes = historico.observe_many(pagina)
+            for item in pagina:
+                ordem += 1
+                desconto = _desconto_pct(item)
+                obs = observacoes.get(item.get("id"))
+                queda = obs.drop_pct if obs else 0.0
+                chave = (queda, desconto)
+                if len(melhores) >= k and chave <= melhores[0][0]:
+                    continue
+
+                preco = item.get("price", 0)
+                produto = {
+                    "title": item.get("title"),
+                    "price": preco,
+                    "price_original": item.get("original_price") or preco,
+                    "desconto_pct": desconto,
+                    "queda_pct": queda,
+                    "thumbnail": item.get("thumbnail"),
+                    "permalink": item.get("permalink"),
+                }
+                if len(melhores) < k:
+                    heapq.heappush(melhores, (chave, -ordem, produto))
+                else:
+                    heapq.heapreplace(melhores, (chave, -ordem, produto))
+
+            # Já temos k ofertas boas: não baixa mais páginas
+            if len(melhores) >= k and min(p["desconto_pct"] for _, _, p in melhores) >= min_desconto:
+                break
+
+    except Exception as e:
+        print(f"[ERRO] Exceção em buscar_produtos: {e}")
+        if not melhores:
             print("[AVISO] usando produtos mockados")
             return produtos_mockados(query)
+        print("[AVISO] usando o que já foi coletado nas páginas anteriores")
 
-        data = resp.json()
+    print(f"[INFO] {paginas} página(s) lidas para '{query}'")
 
-    except Exception as e:
-        print(f"[ERRO] Exceção em buscar_produtos: {e}")
-        print("[AVISO] usando produtos mockados")
-        return produtos_mockados(query)
-
-    produtos = []
-    for item in data.get("results", []):
-        preco = item.get("price", 0)
-        preco_original = item.get("original_price") or preco
-        if preco_original:
-            desconto = round((1 - preco / preco_original) * 100, 2)
-        else:
-            desconto = 0
-
-        produtos.append({
-            "title": item.get("title"),
-            "price": preco,
-            "price_original": preco_original,
-            "desconto_pct": desconto,
-            "thumbnail": item.get("thumbnail"),
-            "permalink": item.get("permalink"),
-        })
-
-    # Ordenar por maior desconto
-    produtos = sorted(produtos, key=lambda p: p["desconto_pct"], reverse=True)
-
-    # Top 10 daquela categoria
-    return produtos[:10]
+    # Maior queda/desconto primeiro (empate: quem apareceu antes na busca)
+    melhores.sort(key=lambda e: (e[0], e[1]), reverse=True)
+    return [produto for _, _, produto in melhores]
 
 
 # ============================================================
@@ -140,7 +189,7 @@ def enviar_whats(destino, texto):
         print("[ERRO] WHATSAPP_TOKEN ou WHATSAPP_PHONE_NUMBER_ID não configurados!")
         return
 
-    url = f"https://graph.facebook.com/v18.0/{WHATSAPP_PHONE_NUMBER_ID}/messages"
+    url = f"{WHATSAPP_GRAPH_BASE}/v18.0/{WHATSAPP_PHONE_NUMBER_ID}/messages"
     headers = {
         "Authorization": f"Bearer {WHATSAPP_TOKEN}",
         "Content-Type": "application/json"
@@ -154,7 +203,7 @@ def enviar_whats(destino, texto):
     }
 
     try:
-        resp = requests.post(url, json=payload, headers=headers, timeout=10)
+        resp = http_client.post(url, json=payload, headers=headers)
         print("Status Whats:", resp.status_code)
         print("Resposta:", resp.text)
     except Exception as e:
@@ -172,8 +221,10 @@ def montar_mensagem(titulo, produtos):
             f"🛒 *{p['title']}*\n"
             f"💰 De R$ {p['price_original']:.2f} por R$ {p['price']:.2f}\n"
             f"📉 Desconto: {p['desconto_pct']}%\n"
-            f"🔗 {gerar_link_afiliado(p['permalink'])}\n\n"
         )
+        if p.get("queda_pct"):
+            texto += f"📊 {p['queda_pct']}% abaixo do menor preço já visto\n"
+        texto += f"🔗 {gerar_link_afiliado(p['permalink'])}\n\n"
     return texto.strip()
 
 
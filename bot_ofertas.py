@@ -1,13 +1,20 @@
 # bot_ofertas.py
+import os
 from typing import List, Dict
 
-from linkbuilder_selenium import conectar_chrome, gerar_link_afiliado
-from whatsapp import abrir_whatsapp, abrir_conversa, enviar_mensagem
+from linkbuilder_selenium import conectar_chrome, gerar_links_afiliado_em_lote
+from whatsapp import WhatsAppSession
 
 # Nome do grupo / conversa no WhatsApp Business Web
 # (texto que aparece dentro do título e NÃO precisa de emoji)
 NOME_CONVERSA = "Ofertas Mercado Livre"
 
+# Conversas que recebem as ofertas, separadas por "|"
+# ex: WPP_CONVERSAS="Ofertas Mercado Livre|Ofertas Casa|Promo Games"
+CONVERSAS: List[str] = [
+    c.strip() for c in os.getenv("WPP_CONVERSAS", NOME_CONVERSA).split("|") if c.strip()
+]
+
 # Lista de produtos de exemplo
 # Depois você pode carregar isso de um CSV, banco, API etc.
 PRODUTOS: List[Dict[str, str]] = [
@@ -22,8 +29,8 @@ def montar_mensagem(produto: Dict[str, str], link_afiliado: str) -> str:
     """
     Monta a mensagem que será enviada no grupo.
 
-    OBS: o whatsapp.py já remove emojis fora do BMP,
-    então aqui você pode até usar emoji simples se quiser.
+    OBS: o whatsapp.py cola o texto inteiro no campo, então quebras de
+    linha e emojis (inclusive fora do BMP) chegam como foram escritos.
     """
     nome = produto.get("nome", "Oferta")
     preco = produto.get("preco", "").strip()
@@ -39,21 +46,24 @@ def montar_mensagem(produto: Dict[str, str], link_afiliado: str) -> str:
 def enviar_ofertas(produtos: List[Dict[str, str]]) -> None:
     """
     - Conecta no Chrome em modo debug
-    - Gera link de afiliado para cada produto
-    - Abre WhatsApp
-    - Abre o grupo
-    - Envia uma mensagem por produto
+    - Gera os links de afiliado de todos os produtos em lote
+    - Abre o WhatsApp numa aba própria (uma vez só)
+    - Para cada conversa de CONVERSAS, abre o chat e manda todas as ofertas
+      em sequência
+    - Mostra o relatório de entrega por conversa
     """
     # 1) Conectar no Chrome já aberto em debug
     driver = conectar_chrome()
 
+    # 2) Gerar todos os links no Mercado Livre de uma vez (isso navega para outras páginas)
+    print(f"[BOT] Gerando links afiliados para {len(produtos)} produtos...")
+    links = gerar_links_afiliado_em_lote([p["url"] for p in produtos], driver=driver)
+
+    mensagens: List[str] = []
     for idx, produto in enumerate(produtos, start=1):
         print(f"\n========== PRODUTO {idx} ==========")
         url_produto = produto["url"]
-        print(f"[BOT] Gerando link afiliado para: {url_produto}")
-
-        # 2) Gerar link no Mercado Livre (isso navega para outras páginas)
-        link_afiliado = gerar_link_afiliado(url_produto, driver=driver)
+        link_afiliado = links.get(url_produto)
 
         if not link_afiliado:
             print("[BOT] ERRO ao gerar link de afiliado. Pulando este produto.")
@@ -61,15 +71,24 @@ def enviar_ofertas(produtos: List[Dict[str, str]]) -> None:
 
         print(f"[BOT] Link afiliado gerado: {link_afiliado}")
 
-        mensagem = montar_mensagem(produto, link_afiliado)
+        mensagens.append(montar_mensagem(produto, link_afiliado))
+
+    if not mensagens:
+        print("\n[BOT] Nenhuma oferta para enviar.")
+        return
 
-        # 3) VOLTAR PARA O WHATSAPP ANTES DE ENVIAR
-        print(f"[BOT] Voltando para o WhatsApp e abrindo conversa '{NOME_CONVERSA}'...")
-        abrir_whatsapp(driver)              # navega de volta para https://web.whatsapp.com
-        abrir_conversa(driver, NOME_CONVERSA)
+    # 3) Aba do WhatsApp: um lote por conversa, trocando de chat pela barra lateral
+    print(f"\n[BOT] Enviando {len(mensagens)} oferta(s) para {len(CONVERSAS)} conversa(s)...")
+    wpp = WhatsAppSession(driver)
+    relatorio = wpp.enviar_para_varias(CONVERSAS, mensagens)
 
-        print(f"[BOT] Enviando mensagem para o grupo '{NOME_CONVERSA}'...")
-        enviar_mensagem(driver, mensagem)
+    print("\n[BOT] Relatório de entrega:")
+    for entrega in relatorio:
+        status = "OK" if entrega.ok else "FALHA"
+        print(f"  [{status}] {entrega.conversa}: {entrega.enviadas} confirmada(s), "
+              f"{entrega.pendentes} pendente(s), {entrega.falhas} falha(s) em {entrega.segundos}s")
+        for erro in entrega.erros:
+            print(f"      - {erro}")
 
     print("\n[BOT] Fim do envio de ofertas!")
 
@@ -23,6 +23,16 @@ class Config:
     download_images: bool
     dry_run: bool
     seen_path: str
+    seen_ttl_days: Optional[float]
+    seen_compact: bool
+    seen_bloom: bool
+    price_history_path: str
+    media_dir: Optional[str]
+    export_path: Optional[str]
+    ml_max_workers: int
+    pipeline_queue_size: int
+    media_workers: int
+    publish_workers: int
 
     @staticmethod
     def load() -> "Config":
@@ -39,4 +49,14 @@ class Config:
             download_images=_as_bool(os.getenv("DOWNLOAD_IMAGES","true"), True),
             dry_run=_as_bool(os.getenv("DRY_RUN","false"), False),
             seen_path=os.getenv("SEEN_PATH","data/seen.json"),
+            seen_ttl_days=float(os.getenv("SEEN_TTL_DAYS")) if os.getenv("SEEN_TTL_DAYS") else None,
+            seen_compact=_as_bool(os.getenv("SEEN_COMPACT","false"), False),
+            seen_bloom=_as_bool(os.getenv("SEEN_BLOOM","false"), False),
+            price_history_path=os.getenv("PRICE_HISTORY_PATH","data/price_history.sqlite"),
+            media_dir=os.getenv("MEDIA_DIR"),
+            export_path=os.getenv("EXPORT_PATH"),
+            ml_max_workers=int(os.getenv("ML_MAX_WORKERS","8")),
+            pipeline_queue_size=int(os.getenv("PIPELINE_QUEUE_SIZE","16")),
+            media_workers=int(os.getenv("PIPELINE_MEDIA_WORKERS","4")),
+            publish_workers=int(os.getenv("PIPELINE_PUBLISH_WORKERS","1")),
         )
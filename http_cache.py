@@ -0,0 +1,127 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import urllib.parse
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+
+@dataclass
+class CacheEntry:
+    body: Any
+    etag: Optional[str]
+    stored_at: float
+
+    def is_fresh(self, ttl: float) -> bool:
+        return ttl > 0 and (time.time() - self.stored_at) < ttl
+
+
+class ResponseCache:
+    """Cache persistente (SQLite) de respostas JSON, com despejo LRU por tamanho.
+
+    As entradas vencidas não são apagadas: continuam servindo de base para
+    revalidação condicional (If-None-Match) até serem despejadas.
+    """
+
+    def __init__(self, path: Path, max_bytes: int = 50 * 1024 * 1024):
+        self.path = path
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            " key TEXT PRIMARY KEY, url TEXT, etag TEXT, body TEXT,"
+            " size INTEGER, stored_at REAL, accessed_at REAL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS responses_lru ON responses(accessed_at)")
+        self._conn.commit()
+        self._total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        self.counters = {"hits": 0, "revalidated": 0, "misses": 0}
+
+    @staticmethod
+    def make_key(url: str, params: Optional[Dict] = None) -> str:
+        query = urllib.parse.urlencode(sorted((params or {}).items()))
+        return hashlib.sha1(f"{url}?{query}".encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[CacheEntry]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT body, etag, stored_at FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if not row:
+                return None
+            self._conn.execute("UPDATE responses SET accessed_at = ? WHERE key = ?", (time.time(), key))
+            self._conn.commit()
+        return CacheEntry(body=json.loads(row[0]), etag=row[1], stored_at=row[2])
+
+    def put(self, key: str, url: str, body: Any, etag: Optional[str] = None) -> None:
+        text = json.dumps(body, ensure_ascii=False)
+        size = len(text.encode("utf-8"))
+        now = time.time()
+        with self._lock:
+            old = self._conn.execute("SELECT size FROM responses WHERE key = ?", (key,)).fetchone()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, url, etag, body, size, stored_at, accessed_at)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (key, url, etag, text, size, now, now),
+            )
+            self._total += size - (old[0] if old else 0)
+            self._evict()
+            self._conn.commit()
+
+    def refresh(self, key: str) -> None:
+        """Marca a entrada como recém-validada (resposta 304)."""
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "UPDATE responses SET stored_at = ?, accessed_at = ? WHERE key = ?", (now, now, key)
+            )
+            self._conn.commit()
+
+    def record(self, outcome: str) -> None:
+        with self._lock:
+            self.counters[outcome] = self.counters.get(outcome, 0) + 1
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+            return {**self.counters, "entries": entries, "bytes": self._total}
+
+    def _evict(self) -> None:
+        # Remove as menos usadas recentemente até caber no limite
+        while self._total > self.max_bytes:
+            rows = self._conn.execute(
+                "SELECT key, size FROM responses ORDER BY accessed_at LIMIT 64"
+            ).fetchall()
+            if not rows:
+                break
+            for key, size in rows:
+                self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self._total -= size
+                if self._total <= self.max_bytes:
+                    break
+
+
+_default: Optional[ResponseCache] = None
+_default_lock = threading.Lock()
+
+
+def default_cache() -> Optional[ResponseCache]:
+    """Cache compartilhado do processo (None se HTTP_CACHE=false)."""
+    global _default
+    if os.getenv("HTTP_CACHE", "true").strip().lower() not in {"1", "true", "yes", "y", "on"}:
+        return None
+    with _default_lock:
+        if _default is None:
+            _default = ResponseCache(
+                Path(os.getenv("HTTP_CACHE_PATH", "data/http_cache.sqlite")),
+                max_bytes=int(os.getenv("HTTP_CACHE_MAX_BYTES", str(50 * 1024 * 1024))),
+            )
+        return _default
@@ -0,0 +1,137 @@
+import os
+import re
+import sqlite3
+import threading
+import time
+import urllib.parse
+from pathlib import Path
+from typing import Optional
+
+# wid=MLB123 / item_id:MLB123 (filtros do catálogo) têm prioridade sobre o
+# /p/MLB... do caminho, que é o ID do produto de catálogo e não do anúncio.
+_ITEM_PARAM = re.compile(r"(?:wid=|item_id(?::|%3A))(MLB)-?(\d+)", re.IGNORECASE)
+_ITEM_PATH = re.compile(r"(MLB)-?(\d{6,})", re.IGNORECASE)
+
+# Parâmetros que apontam o anúncio dentro de uma página de catálogo (/p/MLB...)
+_LISTING_PARAMS = {"wid", "item_id", "pdp_filters"}
+
+
+def item_id_from_url(url: str) -> Optional[str]:
+    """Extrai o ID MLB de uma URL de produto do Mercado Livre, se houver."""
+    if not url:
+        return None
+    m = _ITEM_PARAM.search(url) or _ITEM_PATH.search(url)
+    return f"MLB{m.group(2)}" if m else None
+
+
+def canonical_key(url: str) -> str:
+    """
+    URL sem fragmento, com host minúsculo e só com os parâmetros que
+    identificam o anúncio (wid, item_id, pdp_filters), em ordem fixa: a
+    mesma página de catálogo serve vários vendedores, e tirar a query
+    inteira faria anúncios diferentes dividirem o mesmo link.
+    """
+    parts = urllib.parse.urlsplit(url.strip())
+    query = sorted((k, v) for k, v in urllib.parse.parse_qsl(parts.query, keep_blank_values=True)
+                   if k.lower() in _LISTING_PARAMS)
+    return urllib.parse.urlunsplit((parts.scheme.lower(), parts.netloc.lower(), parts.path.rstrip("/"),
+                                    urllib.parse.urlencode(query), ""))
+
+
+class AffiliateLinkCache:
+    """
+    Cache persistente produto -> link curto /sec/ (SQLite).
+
+    Cada link é gravado sob duas chaves, "item:<MLB...>" e "url:<canônica>",
+    para achar o mesmo produto vindo por URLs diferentes; na leitura, a chave
+    do item tem prioridade sobre a da URL. Com ttl_days, links
+    mais velhos que isso são ignorados (e regerados).
+    """
+
+    def __init__(self, path: Path, ttl_days: Optional[float] = None):
+        self.path = path
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.ttl = ttl_days * 86400 if ttl_days else None
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS links ("
+            " key TEXT PRIMARY KEY, short_url TEXT NOT NULL, item_id TEXT,"
+            " canonical_url TEXT, created_at REAL NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS canonical_urls ("
+            " url_key TEXT PRIMARY KEY, canonical_url TEXT NOT NULL, created_at REAL NOT NULL)"
+        )
+        self._conn.commit()
+
+    @staticmethod
+    def _keys(url: str, item_id: Optional[str] = None, canonical_url: Optional[str] = None):
+        keys = []
+        item_id = item_id or item_id_from_url(url) or (item_id_from_url(canonical_url) if canonical_url else None)
+        if item_id:
+            keys.append(f"item:{item_id.upper()}")
+        for u in (url, canonical_url):
+            if u:
+                keys.append(f"url:{canonical_key(u)}")
+        return list(dict.fromkeys(keys)), item_id
+
+    def get(self, url: str, item_id: Optional[str] = None) -> Optional[str]:
+        keys, _ = self._keys(url, item_id)
+        if not keys:
+            return None
+        marks = ",".join("?" * len(keys))
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT key, short_url, created_at FROM links WHERE key IN ({marks})", keys
+            ).fetchall()
+        # O ID do item vale mais que a URL: é a chave mais específica
+        rows.sort(key=lambda r: keys.index(r[0]))
+        for _, short_url, created_at in rows:
+            if self.ttl is None or time.time() - created_at <= self.ttl:
+                return short_url
+        return None
+
+    def put(self, url: str, short_url: str, item_id: Optional[str] = None,
+            canonical_url: Optional[str] = None) -> None:
+        keys, item_id = self._keys(url, item_id, canonical_url)
+        now = time.time()
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO links (key, short_url, item_id, canonical_url, created_at)"
+                " VALUES (?, ?, ?, ?, ?)",
+                [(k, short_url, item_id, canonical_url or url, now) for k in keys],
+            )
+            self._conn.commit()
+
+    def get_canonical(self, url: str) -> Optional[str]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT canonical_url FROM canonical_urls WHERE url_key = ?", (canonical_key(url),)
+            ).fetchone()
+        return row[0] if row else None
+
+    def put_canonical(self, url: str, canonical_url: str) -> None:
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO canonical_urls (url_key, canonical_url, created_at) VALUES (?, ?, ?)",
+                (canonical_key(url), canonical_url, time.time()),
+            )
+            self._conn.commit()
+
+
+_default: Optional[AffiliateLinkCache] = None
+_default_lock = threading.Lock()
+
+
+def default_link_cache() -> AffiliateLinkCache:
+    global _default
+    with _default_lock:
+        if _default is None:
+            ttl = os.getenv("AFFILIATE_CACHE_TTL_DAYS")
+            _default = AffiliateLinkCache(
+                Path(os.getenv("AFFILIATE_CACHE_PATH", "data/affiliate_links.sqlite")),
+                ttl_days=float(ttl) if ttl else None,
+            )
+        return _default
@@ -0,0 +1,208 @@
+import json
+import os
+import re
+import threading
+import urllib.parse
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional
+
+try:
+    from . import http_client
+except ImportError:  # executado como script solto (bot_ofertas.py etc.)
+    import http_client
+
+# Liga a geração de links por HTTP (replay da chamada do Link Builder)
+LINK_BUILDER_HTTP = os.getenv("LINK_BUILDER_HTTP", "false").strip().lower() in {"1", "true", "yes", "y", "on"}
+
+# Onde fica gravado o modelo da requisição capturada
+LINK_BUILDER_HTTP_TEMPLATE = Path(os.getenv("LINK_BUILDER_HTTP_TEMPLATE", "data/linkbuilder_request.json"))
+
+# Quantas gerações por HTTP rodam ao mesmo tempo
+LINK_BUILDER_HTTP_WORKERS = int(os.getenv("LINK_BUILDER_HTTP_WORKERS", "8"))
+
+# Marca, dentro do corpo gravado, o lugar da URL do produto
+MARCADOR = "{{URL}}"
+
+# Cabeçalhos que não devem ser repetidos (o requests/cookies cuidam deles)
+_CABECALHOS_IGNORADOS = {"cookie", "content-length", "host", "accept-encoding", "connection"}
+
+# Link curto dentro de HTML ou JSON (aspas, '<' e '\' encerram a URL)
+_LINK_SEC = re.compile(r"https?://[^\s\"'<>\\]*mercadolivre\.com[^\s\"'<>\\]*/sec/[^\s\"'<>\\]+")
+
+
+def _log(msg: str) -> None:
+    print(f"[LINK] {msg}")
+
+
+def extrair_links(texto: str) -> List[str]:
+    """Links /sec/ de uma resposta (HTML ou JSON, com ou sem '\\/')."""
+    if not texto:
+        return []
+    return list(dict.fromkeys(_LINK_SEC.findall(texto.replace("\\/", "/"))))
+
+
+def _montar_modelo(req: Dict, corpo: str, url_canonica: str) -> Optional[Dict]:
+    """Troca a URL do produto no corpo pelo MARCADOR, lembrando a codificação usada."""
+    for codificacao, valor in (
+        ("json", json.dumps(url_canonica)[1:-1]),
+        ("raw", url_canonica),
+        ("form", urllib.parse.quote(url_canonica, safe="")),
+        ("form_plus", urllib.parse.quote_plus(url_canonica)),
+    ):
+        if valor and valor in corpo:
+            headers = {k: v for k, v in (req.get("headers") or {}).items()
+                       if not k.startswith(":") and k.lower() not in _CABECALHOS_IGNORADOS}
+            return {
+                "method": req.get("method", "POST"),
+                "url": req["url"],
+                "headers": headers,
+                "body": corpo.replace(valor, MARCADOR),
+                "codificacao": codificacao,
+            }
+    return None
+
+
+def capturar_modelo(driver, url_canonica: str, link: str) -> Optional[Dict]:
+    """
+    Procura, no log de performance do Chrome (eventos de rede do DevTools),
+    a chamada XHR/fetch cuja resposta trouxe `link` e devolve o modelo dela.
+
+    Precisa de um driver aberto com goog:loggingPrefs {"performance": "ALL"}.
+    """
+    try:
+        entradas = driver.get_log("performance")
+    except Exception as e:
+        _log(f"[WARN] Log de rede indisponível neste Chrome: {e}")
+        return None
+
+    pedidos: Dict[str, Dict] = {}
+    for entrada in entradas:
+        try:
+            msg = json.loads(entrada["message"])["message"]
+        except (KeyError, ValueError):
+            continue
+        if msg.get("method") != "Network.requestWillBeSent":
+            continue
+        params = msg.get("params") or {}
+        req = params.get("request") or {}
+        if req.get("method") in ("POST", "PUT") and params.get("type") in ("XHR", "Fetch"):
+            pedidos[params["requestId"]] = req
+
+    # A chamada que gerou o link costuma ser a última
+    for request_id, req in reversed(list(pedidos.items())):
+        try:
+            resposta = driver.execute_cdp_cmd("Network.getResponseBody", {"requestId": request_id})
+        except Exception:
+            continue
+        if link not in extrair_links(resposta.get("body", "")):
+            continue
+        corpo = req.get("postData")
+        if corpo is None:
+            try:
+                corpo = driver.execute_cdp_cmd("Network.getRequestPostData", {"requestId": request_id})["postData"]
+            except Exception:
+                continue
+        modelo = _montar_modelo(req, corpo, url_canonica)
+        if modelo:
+            _log(f"Chamada do Link Builder capturada: {modelo['method']} {modelo['url']}")
+            return modelo
+
+    _log("[WARN] Não achei a chamada de rede que gerou o link.")
+    return None
+
+
+def carregar_modelo(path: Path = LINK_BUILDER_HTTP_TEMPLATE) -> Optional[Dict]:
+    try:
+        return json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return None
+
+
+def salvar_modelo(modelo: Dict, path: Path = LINK_BUILDER_HTTP_TEMPLATE) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(modelo, ensure_ascii=False, indent=2), encoding="utf-8")
+
+
+class LinkBuilderHTTP:
+    """
+    Gera links /sec/ repetindo a chamada de backend do Link Builder com o
+    pool HTTP compartilhado, sem tocar na página. O modelo da chamada vem
+    de capturar_modelo (ou do arquivo gravado) e os cookies vêm da sessão
+    logada do Chrome. Seguro para várias threads.
+    """
+
+    def __init__(self, modelo: Optional[Dict] = None, cookies: Optional[Dict[str, str]] = None,
+                 path: Path = LINK_BUILDER_HTTP_TEMPLATE):
+        self.path = path
+        self.modelo = modelo or carregar_modelo(path)
+        self.cookies: Dict[str, str] = dict(cookies or {})
+        self._lock = threading.Lock()
+
+    @property
+    def pronto(self) -> bool:
+        return bool(self.modelo)
+
+    def atualizar(self, modelo: Optional[Dict] = None, cookies: Optional[Dict[str, str]] = None) -> None:
+        with self._lock:
+            if modelo:
+                self.modelo = modelo
+                salvar_modelo(modelo, self.path)
+            if cookies is not None:
+                self.cookies = dict(cookies)
+
+    def atualizar_cookies_do_driver(self, driver) -> None:
+        try:
+            cookies = {c["name"]: c["value"] for c in driver.get_cookies()}
+        except Exception as e:
+            _log(f"[WARN] Não consegui ler os cookies do Chrome: {e}")
+            return
+        self.atualizar(cookies=cookies)
+
+    def gerar(self, url_canonica: str) -> str:
+        """Um link por chamada; levanta RuntimeError se a resposta não trouxer o link."""
+        with self._lock:
+            modelo, cookies = self.modelo, dict(self.cookies)
+        if not modelo:
+            raise RuntimeError("Modelo da chamada do Link Builder ainda não capturado")
+
+        codificacao = modelo.get("codificacao", "json")
+        if codificacao == "json":
+            valor = json.dumps(url_canonica)[1:-1]
+        elif codificacao == "form":
+            valor = urllib.parse.quote(url_canonica, safe="")
+        elif codificacao == "form_plus":
+            valor = urllib.parse.quote_plus(url_canonica)
+        else:
+            valor = url_canonica
+
+        resp = http_client.request(
+            modelo.get("method", "POST"),
+            modelo["url"],
+            headers=modelo.get("headers") or {},
+            data=modelo["body"].replace(MARCADOR, valor).encode("utf-8"),
+            cookies=cookies,
+        )
+        if resp.status_code >= 400:
+            raise RuntimeError(f"Link Builder HTTP respondeu {resp.status_code}")
+        links = extrair_links(resp.text)
+        if not links:
+            raise RuntimeError("Resposta do Link Builder sem link /sec/")
+        return links[0]
+
+    def gerar_muitos(self, urls_canonicas: List[str],
+                     max_workers: int = LINK_BUILDER_HTTP_WORKERS) -> Dict[str, Optional[str]]:
+        """Gera em paralelo; devolve {url: link ou None} (falhas ficam None)."""
+        urls = list(dict.fromkeys(u for u in urls_canonicas if u))
+
+        def _um(url: str) -> Optional[str]:
+            try:
+                return self.gerar(url)
+            except Exception as e:
+                _log(f"[WARN] HTTP falhou para {url}: {e}")
+                return None
+
+        if not urls:
+            return {}
+        with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(urls)))) as ex:
+            return dict(zip(urls, ex.map(_um, urls)))
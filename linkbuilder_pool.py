@@ -0,0 +1,231 @@
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future, InvalidStateError, TimeoutError as FutureTimeout
+from typing import Dict, List, Optional
+
+try:
+    from .linkbuilder_selenium import LinkBuilder
+    from .link_cache import default_link_cache
+except ImportError:  # executado como script solto (bot_ofertas.py etc.)
+    from linkbuilder_selenium import LinkBuilder
+    from link_cache import default_link_cache
+
+# Uma porta de debug por Chrome/perfil logado, ex: "9222,9223,9224"
+LINK_BUILDER_DEBUG_PORTS = [
+    int(p) for p in os.getenv("LINK_BUILDER_DEBUG_PORTS", "9222").split(",") if p.strip()
+]
+
+# Tempo máximo de um produto antes de o worker ser considerado travado
+LINK_BUILDER_JOB_TIMEOUT = float(os.getenv("LINK_BUILDER_JOB_TIMEOUT", "180"))
+
+# Quantas vezes um produto volta para a fila (sem worker saudável) antes de virar None
+LINK_BUILDER_MAX_TENTATIVAS = int(os.getenv("LINK_BUILDER_MAX_TENTATIVAS", "3"))
+
+
+def _log(msg: str) -> None:
+    print(f"[POOL] {msg}")
+
+
+class _Worker:
+    def __init__(self, porta: int):
+        self.porta = porta
+        self.lb: Optional[LinkBuilder] = None
+        self.inicio_job: Optional[float] = None
+        self.future: Optional[Future] = None
+        self.travado = False
+        self.thread: Optional[threading.Thread] = None
+
+
+class LinkBuilderPool:
+    """
+    Pool de workers do Link Builder, um por Chrome logado (cada um aberto com
+    a sua --remote-debugging-port e o seu --user-data-dir), alimentado por
+    uma fila. Cada worker mantém a sua sessão de LinkBuilder (página do
+    Link Builder aberta e reaproveitada entre produtos).
+
+    Saúde:
+      - antes de cada produto o driver é testado (execute_script); se a
+        sessão morreu, o worker reconecta;
+      - um vigia marca como travado o worker que passar de job_timeout num
+        produto: o produto é devolvido como None para quem espera e o worker
+        descarta a sessão assim que a chamada presa retornar;
+      - um produto que não acha worker saudável volta para a fila até
+        max_tentativas vezes e depois é devolvido como None.
+    """
+
+    def __init__(self, portas: Optional[List[int]] = None, job_timeout: float = LINK_BUILDER_JOB_TIMEOUT,
+                 usar_cache: bool = True, max_tentativas: int = LINK_BUILDER_MAX_TENTATIVAS):
+        self.portas = portas or LINK_BUILDER_DEBUG_PORTS
+        self.job_timeout = job_timeout
+        self.usar_cache = usar_cache
+        self.max_tentativas = max(1, max_tentativas)
+        # Worker, vigia e quem desiste de esperar podem responder pelo mesmo produto
+        self._lock_futures = threading.Lock()
+        self.jobs: "queue.Queue" = queue.Queue()
+        self.workers = [_Worker(p) for p in self.portas]
+        self._parar = threading.Event()
+        for w in self.workers:
+            w.thread = threading.Thread(target=self._loop, args=(w,), name=f"linkbuilder-{w.porta}", daemon=True)
+            w.thread.start()
+        self._vigia = threading.Thread(target=self._vigiar, name="linkbuilder-vigia", daemon=True)
+        self._vigia.start()
+        _log(f"{len(self.workers)} worker(s) nas portas {self.portas}")
+
+    # ------------------------------------------------------------------
+    # API
+    # ------------------------------------------------------------------
+
+    def submit(self, url_produto: str, permalink: Optional[str] = None) -> Future:
+        future: Future = Future()
+        self.jobs.put((url_produto, permalink, future, 0))
+        return future
+
+    def gerar_um(self, url_produto: str, permalink: Optional[str] = None,
+                 timeout: Optional[float] = None) -> Optional[str]:
+        """Um link, esperando no máximo `timeout` (padrão: 2x job_timeout); None se não sair."""
+        future = self.submit(url_produto, permalink=permalink)
+        return self._esperar(future, self.job_timeout * 2 if timeout is None else timeout, url_produto)
+
+    def gerar(self, urls_produto: List[str], timeout: Optional[float] = None) -> Dict[str, Optional[str]]:
+        """
+        Gera os links em paralelo; devolve {url: link ou None}. Espera no
+        máximo `timeout` no total (padrão: job_timeout por rodada de
+        workers, mais uma rodada de folga).
+        """
+        urls = list(dict.fromkeys(u for u in urls_produto if u))
+        cache = default_link_cache() if self.usar_cache else None
+        resultado: Dict[str, Optional[str]] = {}
+        futures: Dict[str, Future] = {}
+        for url in urls:
+            link = cache.get(url) if cache else None
+            if link:
+                resultado[url] = link
+            else:
+                futures[url] = self.submit(url)
+        if timeout is None:
+            rodadas = -(-len(futures) // len(self.workers)) + 1
+            timeout = self.job_timeout * rodadas
+        limite = time.time() + timeout
+        for url, future in futures.items():
+            resultado[url] = self._esperar(future, limite - time.time(), url)
+        return resultado
+
+    def _esperar(self, future: Future, timeout: float, url: str) -> Optional[str]:
+        try:
+            return future.result(timeout=max(0.0, timeout))
+        except FutureTimeout:
+            _log(f"[WARN] Prazo esgotado esperando o link de {url}.")
+            # Quem ainda estiver com o produto na fila ou na mão vai ignorá-lo
+            self._resolver(future, None)
+            return future.result()
+
+    def _resolver(self, future: Future, link: Optional[str]) -> bool:
+        """Responde pelo produto se ninguém respondeu ainda; False se já tinha resposta."""
+        with self._lock_futures:
+            if future.done():
+                return False
+            try:
+                future.set_result(link)
+            except InvalidStateError:
+                return False
+            return True
+
+    def close(self) -> None:
+        self._parar.set()
+        for _ in self.workers:
+            self.jobs.put(None)
+        for w in self.workers:
+            if w.thread:
+                w.thread.join(timeout=5)
+            self._descartar(w)
+
+    # ------------------------------------------------------------------
+    # Workers
+    # ------------------------------------------------------------------
+
+    def _saudavel(self, w: _Worker) -> bool:
+        if w.lb is None or w.lb.driver is None:
+            return False
+        try:
+            w.lb.driver.execute_script("return document.readyState")
+            return True
+        except Exception:
+            return False
+
+    def _descartar(self, w: _Worker) -> None:
+        # Fecha a aba se o Chrome ainda responder; morto ou não, esquece a sessão
+        lb, w.lb = w.lb, None
+        if lb is not None:
+            try:
+                lb.close()
+            except Exception as e:
+                _log(f"[WARN] Falha ao fechar a sessão da porta {w.porta}: {e}")
+
+    def _reciclar(self, w: _Worker) -> bool:
+        _log(f"Reconectando worker da porta {w.porta}...")
+        self._descartar(w)
+        w.lb = LinkBuilder(porta=w.porta)
+        try:
+            w.lb.ensure_logged_in()
+            return True
+        except Exception as e:
+            _log(f"[ERRO] Porta {w.porta} indisponível: {e}")
+            self._descartar(w)
+            return False
+
+    def _loop(self, w: _Worker) -> None:
+        while not self._parar.is_set():
+            job = self.jobs.get()
+            if job is None:
+                break
+            url, permalink, future, tentativas = job
+            if future.done():
+                continue
+
+            if not self._saudavel(w) and not self._reciclar(w):
+                tentativas += 1
+                if tentativas >= self.max_tentativas:
+                    _log(f"[ERRO] Nenhum worker saudável para {url} após {tentativas} tentativa(s).")
+                    self._resolver(future, None)
+                    continue
+                # Devolve para a fila: outro worker (ou este, mais tarde) pega
+                self.jobs.put((url, permalink, future, tentativas))
+                self._parar.wait(5)
+                continue
+
+            cache = default_link_cache() if self.usar_cache else None
+            link = cache.get(url) if cache else None
+            if link:
+                self._resolver(future, link)
+                continue
+
+            w.future, w.inicio_job, w.travado = future, time.time(), False
+            try:
+                link = w.lb.build_affiliate(url, permalink=permalink)
+                if cache and link:
+                    cache.put(url, link, canonical_url=permalink)
+            except Exception as e:
+                _log(f"[ERRO] Worker {w.porta} falhou em {url}: {e}")
+                link = None
+            finally:
+                w.future, w.inicio_job = None, None
+
+            if w.travado:
+                # O vigia já respondeu por este produto; sessão descartada
+                self._descartar(w)
+                continue
+            if link is None and not self._saudavel(w):
+                self._descartar(w)
+            self._resolver(future, link)
+
+    def _vigiar(self) -> None:
+        while not self._parar.wait(5):
+            agora = time.time()
+            for w in self.workers:
+                inicio, future = w.inicio_job, w.future
+                if inicio and future and not future.done() and agora - inicio > self.job_timeout:
+                    _log(f"[WARN] Worker {w.porta} travado há {agora - inicio:.0f}s; reciclando.")
+                    w.travado = True
+                    self._resolver(future, None)
@@ -1,5 +1,7 @@
-import time
-from typing import Optional
+import os
+import threading
+from contextlib import contextmanager
+from typing import Dict, List, Optional
 import re  # ✅ ADICIONE ESTA LINHA
 
 from selenium import webdriver
@@ -9,26 +11,51 @@ from selenium.webdriver.support import expected_conditions as EC
 from selenium.common.exceptions import TimeoutException
 from selenium.webdriver.common.keys import Keys  # ✅ novo import
 
+try:
+    from .link_cache import default_link_cache, item_id_from_url
+    from .linkbuilder_http import LINK_BUILDER_HTTP, LinkBuilderHTTP, capturar_modelo
+    from .tracing import span
+    from . import http_client, ml_api
+except ImportError:  # executado como script solto (bot_ofertas.py etc.)
+    from link_cache import default_link_cache, item_id_from_url
+    from linkbuilder_http import LINK_BUILDER_HTTP, LinkBuilderHTTP, capturar_modelo
+    from tracing import span
+    import http_client
+    import ml_api
+
 # URL do Link Builder
 LINK_BUILDER_URL = "https://www.mercadolivre.com.br/afiliados/linkbuilder#hub"
 
+# Quantas URLs vão juntas numa única geração do Link Builder
+LINK_BUILDER_BATCH_SIZE = int(os.getenv("LINK_BUILDER_BATCH_SIZE", "20"))
+
+# Área da página onde aparecem o campo e os links gerados (sem ela, a página toda)
+LINK_BUILDER_RESULTADO_SELETOR = os.getenv("LINK_BUILDER_RESULTADO_SELETOR", "main")
+
 
 def _log(msg: str) -> None:
     print(f"[LINK] {msg}")
 
 
-def conectar_chrome() -> webdriver.Chrome:
+def _ligar_log_de_rede(options) -> None:
+    # Eventos de rede do DevTools em driver.get_log("performance")
+    options.set_capability("goog:loggingPrefs", {"performance": "ALL"})
+
+
+def conectar_chrome(porta: int = 9222, log_de_rede: bool = False) -> webdriver.Chrome:
     """
-    Conecta em um Chrome já aberto com debug na porta 9222.
+    Conecta em um Chrome já aberto com debug na porta indicada (padrão 9222).
 
     Exemplo de comando para abrir o Chrome manualmente:
       chrome.exe --remote-debugging-port=9222 --user-data-dir=\"C:/chrome-debug\"
 
     (Mantém seu login do Mercado Livre.)
     """
-    _log("Conectando ao Chrome na porta 9222...")
+    _log(f"Conectando ao Chrome na porta {porta}...")
     options = webdriver.ChromeOptions()
-    options.debugger_address = "127.0.0.1:9222"
+    options.debugger_address = f"127.0.0.1:{porta}"
+    if log_de_rede:
+        _ligar_log_de_rede(options)
     driver = webdriver.Chrome(options=options)
     driver.implicitly_wait(5)
     return driver
@@ -61,6 +88,60 @@ def obter_url_canonica_no_navegador(driver, url_produto: str) -> str:
     return url_final
 
 
+def _url_canonica_por_http(url_produto: str) -> Optional[str]:
+    """
+    Segue os redirects da URL do produto só com HTTP (sem baixar o corpo)
+    e devolve a URL final, se for uma página do Mercado Livre.
+    """
+    headers = {"User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64)"}
+    try:
+        resp = http_client.get(url_produto, headers=headers, allow_redirects=True, stream=True)
+        resp.close()
+    except Exception as e:
+        _log(f"[WARN] Redirect HTTP falhou para {url_produto}: {e}")
+        return None
+    if resp.status_code >= 400 or "mercadolivre.com" not in resp.url:
+        return None
+    return resp.url
+
+
+def resolver_url_canonica(
+    url_produto: str, permalink: Optional[str] = None, driver: Optional[webdriver.Chrome] = None
+) -> str:
+    """
+    URL canônica para o Link Builder, do jeito mais barato possível:
+      1. permalink já conhecido (vindo da API);
+      2. cache local;
+      3. permalink do item na API (ID MLB tirado da URL);
+      4. redirects HTTP, sem renderizar;
+      5. navegador (obter_url_canonica_no_navegador), só se tudo acima falhar.
+    """
+    if permalink:
+        return permalink
+
+    cache = default_link_cache()
+    url = cache.get_canonical(url_produto)
+    if url:
+        return url
+
+    item_id = item_id_from_url(url_produto)
+    if item_id:
+        try:
+            url = (ml_api.get_item_details(item_id) or {}).get("permalink")
+        except Exception as e:
+            _log(f"[WARN] API não devolveu permalink de {item_id}: {e}")
+    if not url:
+        url = _url_canonica_por_http(url_produto)
+    if not url:
+        if driver is None:
+            driver = conectar_chrome()
+        url = obter_url_canonica_no_navegador(driver, url_produto)
+
+    _log(f"URL canônica: {url}")
+    cache.put_canonical(url_produto, url)
+    return url
+
+
 def _encontrar_textarea_entrada(driver):
     """
     Encontra o textarea (campo de entrada) no Link Builder.
@@ -83,47 +164,137 @@ def _encontrar_botao_gerar(driver, timeout: int = 60):
     _log("Botão 'Gerar' localizado e clicável.")
     return botao
 
-def _extrair_primeiro_link_afiliado(texto: str) -> Optional[str]:
+def _extrair_links_afiliado(texto: str) -> List[str]:
     """
-    Procura a primeira URL do ML com '/sec/' dentro do texto.
+    Todas as URLs do ML com '/sec/' dentro do texto, na ordem em que aparecem.
     """
     if not texto:
-        return None
+        return []
 
     # acha qualquer http(s)://...
     candidatos = re.findall(r"https?://[^\s]+", texto)
-    for url in candidatos:
-        if "mercadolivre.com" in url and "/sec/" in url:
-            return url
+    return [url for url in candidatos if "mercadolivre.com" in url and "/sec/" in url]
 
-    return None
 
-def _esperar_link_gerado(driver, timeout=60) -> Optional[str]:
+def _extrair_primeiro_link_afiliado(texto: str) -> Optional[str]:
     """
-    Espera o ML gerar o link e varre inputs, textareas e divs,
-    extraindo apenas a URL curta (https://mercadolivre.com/sec/...).
+    Procura a primeira URL do ML com '/sec/' dentro do texto.
     """
-    _log("Aguardando link gerado aparecer (varrendo inputs, textareas e innerText)...")
+    links = _extrair_links_afiliado(texto)
+    return links[0] if links else None
+
+# Roda dentro da página: observa a área de resultado (MutationObserver) e,
+# como o .value de inputs/textareas não gera mutação, também confere a cada
+# 250 ms. Rajadas de mutações viram uma só leitura. Tudo sem idas e vindas
+# ao chromedriver; só a resposta final volta para o Python.
+_JS_ESPERAR_LINKS = r"""
+const minimo = arguments[0], timeoutMs = arguments[1], estavelMs = arguments[2];
+const ignorar = new Set(arguments[3] || []);
+const seletor = arguments[4];
+// Buscada de novo a cada leitura: a página pode trocar o container inteiro
+const raiz = () => (seletor && document.querySelector(seletor)) || document.body || document.documentElement;
+const done = arguments[arguments.length - 1];
+
+function coletar() {
+  const links = [];
+  const add = (texto) => {
+    if (!texto) return;
+    for (const m of texto.matchAll(/https?:\/\/\S+/g)) {
+      const url = m[0];
+      if (url.includes("mercadolivre.com") && url.includes("/sec/") && !ignorar.has(url) && !links.includes(url)) links.push(url);
+    }
+  };
+  const area = raiz();
+  area.querySelectorAll("input, textarea").forEach((el) => add(el.value));
+  add(area.innerText);
+  return links;
+}
+
+let ultimo = -1, mudouEm = Date.now(), terminou = false;
+let observer = null, intervalo = null, limite = null, agendado = null;
+
+function terminar(links) {
+  if (terminou) return;
+  terminou = true;
+  if (observer) observer.disconnect();
+  clearInterval(intervalo);
+  clearTimeout(limite);
+  clearTimeout(agendado);
+  done(links);
+}
+
+function conferir() {
+  const links = coletar();
+  if (links.length !== ultimo) { ultimo = links.length; mudouEm = Date.now(); }
+  if (links.length >= minimo) return terminar(links);
+  if (links.length > 0 && Date.now() - mudouEm >= estavelMs) terminar(links);
+}
+
+function agendar() {
+  if (agendado === null) agendado = setTimeout(() => { agendado = null; conferir(); }, 50);
+}
+
+observer = new MutationObserver(agendar);
+observer.observe(raiz(), { subtree: true, childList: true, characterData: true, attributes: true });
+intervalo = setInterval(conferir, 250);
+limite = setTimeout(() => terminar(coletar()), timeoutMs);
+conferir();
+"""
+
+
+@contextmanager
+def _script_timeout(driver, segundos: float):
+    """Troca o timeout de scripts assíncronos só durante o bloco: o driver pode
+    ser o Chrome de debug compartilhado com outros fluxos."""
+    try:
+        anterior = driver.timeouts.script
+    except Exception:
+        anterior = 30  # padrão do WebDriver
+    driver.set_script_timeout(segundos)
+    try:
+        yield
+    finally:
+        try:
+            driver.set_script_timeout(anterior)
+        except Exception:
+            pass
 
-    fim = time.time() + timeout
 
-    while time.time() < fim:
-        campos = driver.find_elements(By.CSS_SELECTOR, "input, textarea, div")
+def _esperar_links_gerados(driver, esperados: int, timeout=90, estavel_s=5,
+                           ignorar: Optional[List[str]] = None) -> List[str]:
+    """
+    Espera o ML gerar os links /sec/ e devolve todos (sem repetir, na ordem
+    da página), numa única chamada de script. Volta quando houver
+    `esperados` links ou quando a contagem ficar parada por `estavel_s`
+    segundos (geração parcial: alguma URL do lote foi recusada).
+
+    Links em `ignorar` (resultado anterior ainda na tela) não contam.
+    """
+    _log(f"Aguardando {esperados} link(s) gerado(s) (observando a página)...")
+    try:
+        with _script_timeout(driver, timeout + 10):
+            links = driver.execute_async_script(
+                _JS_ESPERAR_LINKS, esperados, int(timeout * 1000), int(estavel_s * 1000),
+                list(ignorar or []), LINK_BUILDER_RESULTADO_SELETOR,
+            ) or []
+    except Exception as e:
+        _log(f"[WARN] Script de espera falhou: {e}")
+        return []
 
-        for c in campos:
-            textos = [
-                (c.get_attribute("value") or "").strip(),
-                (c.get_attribute("innerText") or "").strip(),
-                (c.text or "").strip(),
-            ]
+    if 0 < len(links) < esperados:
+        _log(f"[WARN] Só {len(links)} de {esperados} links foram gerados.")
+    return [link for t in links for link in _extrair_links_afiliado(t)]
 
-            for t in textos:
-                link = _extrair_primeiro_link_afiliado(t)
-                if link:
-                    _log(f"Link encontrado: {link}")
-                    return link
 
-        time.sleep(1)
+def _esperar_link_gerado(driver, timeout=60, ignorar: Optional[List[str]] = None) -> Optional[str]:
+    """
+    Espera o ML gerar o link, extraindo apenas a URL curta
+    (https://mercadolivre.com/sec/...).
+    """
+    links = _esperar_links_gerados(driver, esperados=1, timeout=timeout, ignorar=ignorar)
+    if links:
+        _log(f"Link encontrado: {links[0]}")
+        return links[0]
 
     _log("[ERRO] Não foi possível encontrar o link depois do timeout. Salvando HTML...")
     try:
@@ -136,50 +307,70 @@ def _esperar_link_gerado(driver, timeout=60) -> Optional[str]:
 
 
 def gerar_link_afiliado(
-    url_produto: str, driver: Optional[webdriver.Chrome] = None
+    url_produto: str,
+    driver: Optional[webdriver.Chrome] = None,
+    usar_cache: bool = True,
+    permalink: Optional[str] = None,
 ) -> Optional[str]:
     """
     Fluxo:
-      1. Abre a página do produto no Chrome e pega a URL canônica.
+      0. Consulta o cache de links (por ID MLB e URL canônica); se achar, nem abre o navegador.
+      1. Resolve a URL canônica (permalink/API/redirect; navegador só em último caso).
       2. Abre o Link Builder.
       3. Digita a URL canônica no textarea (como usuário).
       4. Clica em 'Gerar'.
-      5. Lê o link curto gerado.
+      5. Lê o link curto gerado (e guarda no cache).
     """
     _log(f"GERANDO LINK PARA PRODUTO: {url_produto}")
 
+    cache = default_link_cache() if usar_cache else None
+    if cache:
+        with span("link.cache") as s:
+            link = cache.get(url_produto)
+            s["hit"] = bool(link)
+        if link:
+            _log(f"Link vindo do cache: {link}")
+            return link
+
     criado_driver = False
     if driver is None:
         driver = conectar_chrome()
         criado_driver = True
 
     try:
-        # 1) Obter URL canônica via navegador (sem usar requests)
-        url_canonica = obter_url_canonica_no_navegador(driver, url_produto)
+        # 1) Obter URL canônica (sem renderizar a página, se possível)
+        with span("link.canonica"):
+            url_canonica = resolver_url_canonica(url_produto, permalink=permalink, driver=driver)
 
         # 2) Abrir Link Builder
         _log(f"Abrindo Link Builder: {LINK_BUILDER_URL}")
-        driver.get(LINK_BUILDER_URL)
+        with span("link.abrir_pagina"):
+            driver.get(LINK_BUILDER_URL)
 
         # 3) Digitar a URL no textarea como se fosse um usuário
-        textarea = _encontrar_textarea_entrada(driver)
-        _log("Inserindo URL do produto no textarea...")
-        textarea.clear()
-        textarea.send_keys(url_canonica)
-        textarea.send_keys(Keys.ENTER)
+        with span("link.textarea"):
+            textarea = _encontrar_textarea_entrada(driver)
+            _log("Inserindo URL do produto no textarea...")
+            textarea.clear()
+            textarea.send_keys(url_canonica)
+            textarea.send_keys(Keys.ENTER)
 
         # 4) Clicar em "Gerar" quando estiver habilitado
-        botao_gerar = _encontrar_botao_gerar(driver)
-        _log("Clicando em 'Gerar'...")
-        botao_gerar.click()
+        with span("link.botao_gerar"):
+            botao_gerar = _encontrar_botao_gerar(driver)
+            _log("Clicando em 'Gerar'...")
+            botao_gerar.click()
 
         # 5) Esperar link curto aparecer
-        link = _esperar_link_gerado(driver, timeout=60)
+        with span("link.extrair"):
+            link = _esperar_link_gerado(driver, timeout=60)
         if not link:
             _log("[ERRO] Timeout esperando link de afiliado aparecer.")
             return None
 
         _log(f"✅ LINK GERADO: {link}")
+        if cache:
+            cache.put(url_produto, link, canonical_url=url_canonica)
         return link
 
     except Exception as e:
@@ -194,3 +385,392 @@ def gerar_link_afiliado(
                 driver.implicitly_wait(0)
             except Exception:
                 pass
+
+
+def _resolver_destino(link_curto: str) -> Optional[str]:
+    """Segue os redirects do link /sec/ (sem navegador) e devolve a URL final."""
+    try:
+        resp = http_client.request("HEAD", link_curto, allow_redirects=True)
+        return resp.url
+    except Exception as e:
+        _log(f"[WARN] Não consegui resolver {link_curto}: {e}")
+        return None
+
+
+def _mapear_links(lote: List[str], canonicas: Dict[str, str], links: List[str]) -> Dict[str, str]:
+    """
+    Associa cada link gerado ao produto de origem. Se vieram tantos links
+    quanto URLs, a ordem do Link Builder é a da entrada; senão, cada link é
+    resolvido e casado pelo ID MLB do destino.
+    """
+    if len(links) == len(lote):
+        return dict(zip(lote, links))
+
+    por_id: Dict[str, str] = {}
+    for url in lote:
+        for candidato in (url, canonicas.get(url)):
+            item_id = item_id_from_url(candidato or "")
+            if item_id:
+                por_id.setdefault(item_id, url)
+
+    mapeados: Dict[str, str] = {}
+    for link in links:
+        destino = _resolver_destino(link)
+        url = por_id.get(item_id_from_url(destino or "") or "")
+        if url and url not in mapeados:
+            mapeados[url] = link
+    return mapeados
+
+
+def _gerar_lote(driver, urls_canonicas: List[str]) -> List[str]:
+    _log(f"Abrindo Link Builder para um lote de {len(urls_canonicas)} URLs")
+    driver.get(LINK_BUILDER_URL)
+
+    textarea = _encontrar_textarea_entrada(driver)
+    textarea.clear()
+    # Uma URL por linha, como o Link Builder aceita no campo
+    textarea.send_keys("\n".join(urls_canonicas))
+    textarea.send_keys(Keys.ENTER)
+
+    botao_gerar = _encontrar_botao_gerar(driver)
+    _log("Clicando em 'Gerar' (lote)...")
+    botao_gerar.click()
+
+    return _esperar_links_gerados(driver, esperados=len(urls_canonicas))
+
+
+def gerar_links_afiliado_em_lote(
+    urls_produto: List[str],
+    driver: Optional[webdriver.Chrome] = None,
+    usar_cache: bool = True,
+    tamanho_lote: int = LINK_BUILDER_BATCH_SIZE,
+    fallback_individual: bool = True,
+) -> Dict[str, Optional[str]]:
+    """
+    Gera links de afiliado para vários produtos com um único 'Gerar' por lote.
+
+    Devolve {url_produto: link ou None}. URLs que o lote não conseguir
+    mapear são tentadas uma a uma (se fallback_individual).
+    """
+    urls = list(dict.fromkeys(u for u in urls_produto if u))
+    resultado: Dict[str, Optional[str]] = {u: None for u in urls}
+
+    cache = default_link_cache() if usar_cache else None
+    pendentes = []
+    for url in urls:
+        link = cache.get(url) if cache else None
+        if link:
+            resultado[url] = link
+        else:
+            pendentes.append(url)
+    _log(f"Lote: {len(urls) - len(pendentes)} do cache, {len(pendentes)} para gerar")
+    if not pendentes:
+        return resultado
+
+    if driver is None:
+        driver = conectar_chrome()
+
+    canonicas: Dict[str, str] = {}
+    for url in pendentes:
+        try:
+            canonicas[url] = resolver_url_canonica(url, driver=driver)
+        except Exception as e:
+            _log(f"[WARN] URL canônica falhou para {url}: {e}")
+            canonicas[url] = url
+
+    for inicio in range(0, len(pendentes), max(1, tamanho_lote)):
+        lote = pendentes[inicio:inicio + tamanho_lote]
+        try:
+            links = _gerar_lote(driver, [canonicas[u] for u in lote])
+        except Exception as e:
+            _log(f"[ERRO] Lote falhou: {e}")
+            continue
+        for url, link in _mapear_links(lote, canonicas, links).items():
+            resultado[url] = link
+            if cache:
+                cache.put(url, link, canonical_url=canonicas[url])
+
+    faltando = [u for u in pendentes if not resultado[u]]
+    if faltando and fallback_individual:
+        _log(f"{len(faltando)} URLs sem link no lote; tentando individualmente...")
+        for url in faltando:
+            resultado[url] = gerar_link_afiliado(url, driver=driver, usar_cache=usar_cache)
+
+    return resultado
+
+
+def _descartar_log_de_rede(driver) -> None:
+    """Esvazia o log de performance, para a captura só ver a geração seguinte."""
+    try:
+        driver.get_log("performance")
+    except Exception:
+        pass
+
+
+def _links_na_tela(driver) -> List[str]:
+    """Links /sec/ que já estão na página (resultado de uma geração anterior)."""
+    try:
+        with _script_timeout(driver, 10):
+            return driver.execute_async_script(
+                _JS_ESPERAR_LINKS, 0, 1000, 0, [], LINK_BUILDER_RESULTADO_SELETOR
+            ) or []
+    except Exception:
+        return []
+
+
+class LinkBuilder:
+    """
+    Sessão persistente do Link Builder.
+
+    A página fica aberta numa aba própria (window handle guardado) e é
+    reaproveitada entre produtos: o textarea é limpo e preenchido de novo,
+    sem recarregar LINK_BUILDER_URL. O login é conferido uma vez; a sessão
+    só é refeita (reconexão + nova aba) quando algo falha.
+
+    Sem `driver`, abre um Chrome próprio se houver `user_data_dir` (perfil
+    já logado no ML) ou conecta no Chrome de debug da `porta`.
+
+    Com `modo_http` (LINK_BUILDER_HTTP), a primeira geração pela página
+    serve para capturar a chamada de backend do Link Builder; as seguintes
+    vão direto por HTTP com os cookies da sessão (várias threads ao mesmo
+    tempo), e a página só volta a ser usada quando o HTTP falha.
+    """
+
+    def __init__(self, headless: bool = False, user_data_dir: Optional[str] = None,
+                 chrome_binary_path: Optional[str] = None, driver: Optional[webdriver.Chrome] = None,
+                 porta: int = 9222, timeout: int = 60, modo_http: bool = LINK_BUILDER_HTTP):
+        self.headless = headless
+        self.user_data_dir = user_data_dir
+        self.chrome_binary_path = chrome_binary_path
+        self.porta = porta
+        self.timeout = timeout
+        self.driver = driver
+        self._driver_proprio = False  # True só quando fomos nós que abrimos o Chrome
+        self._aba: Optional[str] = None
+        self._logado = False
+        self.http: Optional[LinkBuilderHTTP] = LinkBuilderHTTP() if modo_http else None
+        # A página é uma só: o caminho Selenium roda uma geração por vez
+        self._lock = threading.RLock()
+
+    # ------------------------------------------------------------------
+    # Sessão
+    # ------------------------------------------------------------------
+
+    def _abrir_driver(self) -> None:
+        if self.user_data_dir:
+            _log(f"Abrindo Chrome com o perfil {self.user_data_dir}...")
+            options = webdriver.ChromeOptions()
+            options.add_argument(f"--user-data-dir={self.user_data_dir}")
+            if self.headless:
+                options.add_argument("--headless=new")
+            if self.chrome_binary_path:
+                options.binary_location = self.chrome_binary_path
+            if self.http:
+                _ligar_log_de_rede(options)
+            self.driver = webdriver.Chrome(options=options)
+            self._driver_proprio = True
+        else:
+            self.driver = conectar_chrome(self.porta, log_de_rede=self.http is not None)
+            self._driver_proprio = False
+        self.driver.set_page_load_timeout(self.timeout)
+
+    def _abrir_aba(self) -> None:
+        """Abre o Link Builder numa aba nova (ou na única aba do Chrome próprio)."""
+        if self.driver is None:
+            self._abrir_driver()
+        if not self._driver_proprio:
+            # Chrome do usuário: não mexe nas abas que ele já tem abertas
+            self.driver.switch_to.new_window("tab")
+        self._aba = self.driver.current_window_handle
+        _log(f"Abrindo Link Builder: {LINK_BUILDER_URL}")
+        self.driver.get(LINK_BUILDER_URL)
+
+    def _na_pagina(self) -> bool:
+        """Volta para a aba do Link Builder; False se ela sumiu ou saiu da página."""
+        if self.driver is None or self._aba is None:
+            return False
+        try:
+            if self.driver.current_window_handle != self._aba:
+                self.driver.switch_to.window(self._aba)
+            return "/afiliados/linkbuilder" in self.driver.current_url
+        except Exception:
+            return False
+
+    def _garantir_pagina(self) -> None:
+        if self._na_pagina():
+            return
+        if self._aba is not None:
+            try:
+                self.driver.switch_to.window(self._aba)
+                self.driver.get(LINK_BUILDER_URL)
+                return
+            except Exception:
+                self._aba = None
+        self._abrir_aba()
+
+    def _reconectar(self) -> None:
+        _log("Refazendo a sessão do Link Builder...")
+        if self._driver_proprio:
+            try:
+                self.driver.quit()
+            except Exception:
+                pass
+            self.driver = None
+        else:
+            try:
+                self.driver.execute_script("return 1")
+            except Exception:
+                self.driver = None
+            else:
+                self._fechar_aba()
+        self._aba = None
+        self._garantir_pagina()
+
+    def _fechar_aba(self) -> None:
+        """Fecha a aba do Link Builder no Chrome do usuário e volta para outra aba dele."""
+        if self._aba is None:
+            return
+        try:
+            self.driver.switch_to.window(self._aba)
+            self.driver.close()
+        except Exception:
+            pass
+        try:
+            abas = self.driver.window_handles
+            if abas:
+                self.driver.switch_to.window(abas[0])
+        except Exception:
+            pass
+
+    def ensure_logged_in(self) -> None:
+        """Abre o Link Builder e confere o login uma única vez por sessão."""
+        with self._lock:
+            if self._logado:
+                return
+            self._garantir_pagina()
+            try:
+                _encontrar_textarea_entrada(self.driver)
+            except TimeoutException:
+                raise RuntimeError(
+                    "Link Builder não carregou; faça login no Mercado Livre nesse perfil do Chrome "
+                    f"(URL atual: {self.driver.current_url})"
+                )
+            if self.http:
+                self.http.atualizar_cookies_do_driver(self.driver)
+            self._logado = True
+            _log("Sessão do Link Builder pronta.")
+
+    # ------------------------------------------------------------------
+    # Geração
+    # ------------------------------------------------------------------
+
+    def _gerar(self, url_canonica: str) -> str:
+        with span("link.abrir_pagina"):
+            self._garantir_pagina()
+            anteriores = _links_na_tela(self.driver)
+
+        with span("link.textarea"):
+            textarea = _encontrar_textarea_entrada(self.driver)
+            textarea.clear()
+            textarea.send_keys(Keys.CONTROL, "a")
+            textarea.send_keys(Keys.DELETE)
+            textarea.send_keys(url_canonica)
+            textarea.send_keys(Keys.ENTER)
+
+        if self.http:
+            _descartar_log_de_rede(self.driver)
+        with span("link.botao_gerar"):
+            _encontrar_botao_gerar(self.driver).click()
+        with span("link.extrair"):
+            link = _esperar_link_gerado(self.driver, timeout=self.timeout, ignorar=anteriores)
+        if not link:
+            raise RuntimeError(f"Link Builder não devolveu link para {url_canonica}")
+
+        if self.http:
+            # (Re)captura a chamada e renova os cookies para as próximas gerações
+            self.http.atualizar(modelo=capturar_modelo(self.driver, url_canonica, link))
+            self.http.atualizar_cookies_do_driver(self.driver)
+        return link
+
+    def build_affiliate(self, url: str, permalink: Optional[str] = None) -> str:
+        """
+        Gera o link curto /sec/ de `url` na página já aberta. Tenta de novo
+        uma vez, com a sessão refeita, se a primeira tentativa falhar.
+        Levanta RuntimeError se não conseguir.
+        """
+        self.ensure_logged_in()
+        with span("link.canonica"):
+            url_canonica = resolver_url_canonica(url, permalink=permalink, driver=self.driver)
+
+        if self.http and self.http.pronto:
+            try:
+                with span("link.http"):
+                    link = self.http.gerar(url_canonica)
+                _log(f"✅ LINK GERADO (HTTP): {link}")
+                return link
+            except Exception as e:
+                _log(f"[WARN] Geração por HTTP falhou, usando a página: {e}")
+
+        with self._lock:
+            return self._gerar_com_retentativa(url, url_canonica)
+
+    def _gerar_com_retentativa(self, url: str, url_canonica: str) -> str:
+        erro: Optional[Exception] = None
+        for tentativa in range(2):
+            try:
+                link = self._gerar(url_canonica)
+                _log(f"✅ LINK GERADO: {link}")
+                return link
+            except Exception as e:
+                erro = e
+                _log(f"[WARN] Geração falhou (tentativa {tentativa + 1}): {e}")
+                if tentativa == 0:
+                    try:
+                        self._reconectar()
+                    except Exception as e2:
+                        erro = e2
+                        break
+        raise RuntimeError(f"Não foi possível gerar o link de {url}: {erro}")
+
+    def build_affiliate_many(self, urls: List[str],
+                             permalinks: Optional[Dict[str, str]] = None) -> Dict[str, Optional[str]]:
+        """
+        Vários links de uma vez: por HTTP em paralelo quando o modelo já foi
+        capturado, e pela página (um por vez) para o que faltar.
+        Devolve {url: link ou None}.
+        """
+        permalinks = permalinks or {}
+        urls = list(dict.fromkeys(u for u in urls if u))
+        resultado: Dict[str, Optional[str]] = {u: None for u in urls}
+        if not urls:
+            return resultado
+        self.ensure_logged_in()
+
+        canonicas = {u: resolver_url_canonica(u, permalink=permalinks.get(u), driver=self.driver) for u in urls}
+        if self.http and self.http.pronto:
+            por_canonica = self.http.gerar_muitos(list(canonicas.values()))
+            for u in urls:
+                resultado[u] = por_canonica.get(canonicas[u])
+
+        for u in urls:
+            if resultado[u]:
+                continue
+            try:
+                with self._lock:
+                    resultado[u] = self._gerar_com_retentativa(u, canonicas[u])
+            except Exception as e:
+                _log(f"[ERRO] {e}")
+        return resultado
+
+    def close(self) -> None:
+        """Fecha a aba do Link Builder (ou o Chrome, se foi aberto por nós)."""
+        if self.driver is None:
+            return
+        if self._driver_proprio:
+            try:
+                self.driver.quit()
+            except Exception:
+                pass
+        else:
+            self._fechar_aba()
+        self.driver, self._aba, self._logado = None, None, False
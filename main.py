@@ -1,107 +1,270 @@
-from typing import List, Dict
+import itertools
+import threading
+from typing import List, Dict, Tuple
 from pathlib import Path
 
 from .config import Config
-from .ml_api import top_sellers_by_category, get_item_details
+from .ml_api import top_sellers_by_category, get_items_details, OFFER_ATTRIBUTES
 from .linkbuilder_selenium import LinkBuilder
+from .linkbuilder_pool import LINK_BUILDER_DEBUG_PORTS, LinkBuilderPool
 from .message import format_offer
 from .publishers import telegram as tg
 from .publishers import whatsapp as wa
 from .publishers import x_poster
 from .media import download_image
 from .seen import SeenDB
+from .price_history import PriceHistory
+from .link_cache import default_link_cache
+from .pipeline import Pipeline
 
 def build_and_publish():
+    """
+    Pipeline em etapas ligadas por filas limitadas (PIPELINE_QUEUE_SIZE):
+
+      fetch   (ML_MAX_WORKERS)           mais vendidos de cada categoria
+      enrich  (1)                        filtra vistos, histórico de preço, detalhes (multiget)
+      link    (1 por Chrome do pool)     link afiliado (cache -> LinkBuilder ou pool) e texto da oferta
+      media   (PIPELINE_MEDIA_WORKERS)   download da imagem
+      publish (PIPELINE_PUBLISH_WORKERS) Telegram / WhatsApp, export e SeenDB
+
+    Busca e imagens andam enquanto o Link Builder e a publicação (lentos)
+    trabalham. A busca termina fora de ordem, então o enrich segura as
+    categorias até chegar a vez de cada uma (ordem de ML_CATEGORIES); link e
+    media em paralelo embaralham as ofertas, e o publish as devolve a essa
+    ordem (com PIPELINE_PUBLISH_WORKERS=1, é a ordem de publicação). Mesmo
+    interrompido, o SeenDB e o export são gravados.
+    """
     cfg = Config.load()
     if not cfg.categories:
         raise SystemExit("Defina ML_CATEGORIES no .env, ex: MLB1051,MLB1648")
 
-    seen = SeenDB(Path(cfg.seen_path))
+    seen = SeenDB(Path(cfg.seen_path), ttl_days=cfg.seen_ttl_days,
+                  compact=cfg.seen_compact, bloom=cfg.seen_bloom)
+    history = PriceHistory(Path(cfg.price_history_path))
+    links = default_link_cache()
 
-    # Instancia LinkBuilder
-    lb = LinkBuilder(headless=cfg.headless, user_data_dir=cfg.chrome_user_data_dir, chrome_binary_path=cfg.chrome_binary_path)
-    lb.ensure_logged_in()
+    # Vários Chromes de debug (LINK_BUILDER_DEBUG_PORTS): um LinkBuilder por
+    # porta, num pool; senão, um LinkBuilder só
+    pool, lb = None, None
+    if len(LINK_BUILDER_DEBUG_PORTS) > 1:
+        # O cache fica por conta da etapa link (que conhece o item_id)
+        pool = LinkBuilderPool(usar_cache=False)
+    else:
+        lb = LinkBuilder(headless=cfg.headless, user_data_dir=cfg.chrome_user_data_dir, chrome_binary_path=cfg.chrome_binary_path)
+        lb.ensure_logged_in()
 
-    exported_rows: List[Dict] = []
-    media_dir = Path(__file__).resolve().parent.parent / "data" / "media"
+    exported_rows: List[Tuple[Tuple[int, int], Dict]] = []
+    exported_lock = threading.Lock()
+    data_dir = Path(__file__).resolve().parent.parent / "data"
+    media_dir = Path(cfg.media_dir) if cfg.media_dir else data_dir / "media"
 
-    try:
-        for cat in cfg.categories:
+    # Só a etapa enrich mexe aqui (1 worker): processa as categorias na
+    # ordem de ML_CATEGORIES (a busca termina fora de ordem), evita publicar
+    # o mesmo item que aparece em duas categorias e numera as ofertas
+    emitted = set()
+    sequence = itertools.count()
+    fetched: Dict[int, Tuple[str, List[Dict]]] = {}
+    next_category = [0]
+
+    # Ofertas que chegaram ao publish antes das anteriores a elas
+    waiting: Dict[int, Dict] = {}
+    next_seq = [0]
+    waiting_lock = threading.Lock()
+
+    def fetch(job, emit):
+        order, cat = job
+        # Sempre emite (vazio se falhar): o enrich espera cada categoria na ordem
+        try:
             items = top_sellers_by_category(cat, cfg.top_n)
-            for it in items:
-                item_id = it.get("id")
-                if not item_id or seen.has(item_id):
-                    continue
+        except Exception as e:
+            print(f"[WARN] Falha ao buscar categoria {cat}: {e}")
+            items = []
+        emit((order, cat, items))
+
+    def enrich(batch, emit):
+        order, cat, items = batch
+        fetched[order] = (cat, items)
+        while next_category[0] in fetched:
+            order = next_category[0]
+            cat, items = fetched.pop(order)
+            next_category[0] += 1
+            try:
+                enrich_category(order, cat, items, emit)
+            except Exception as e:
+                print(f"[WARN] Enrich falhou para a categoria {cat}: {e}")
+
+    def enrich_category(order, cat, items, emit):
+        unseen = []
+        for it in items:
+            item_id = it.get("id")
+            if item_id and item_id not in emitted and not seen.has(item_id):
+                emitted.add(item_id)
+                unseen.append(it)
+        if not unseen:
+            return
+
+        # Detalhes em lotes (multiget), baixados de novo só quando o preço da busca mudou
+        observations = history.observe_many(unseen)
+        cached = history.cached_details_many(observations)
+        stale_ids = [i for i, obs in observations.items() if obs.changed or i not in cached]
+        fresh = get_items_details(stale_ids, attributes=OFFER_ATTRIBUTES)
+        history.store_details_many(fresh)
+        details = {**cached, **fresh}
+
+        for pos, it in enumerate(unseen):
+            item_id = it["id"]
+            full = details.get(item_id, {})
+            product_url = full.get("permalink") or it.get("permalink")
+            if not product_url:
+                continue
+            emit({
+                "seq": next(sequence),
+                "order": (order, pos),
+                "category": cat,
+                "item_id": item_id,
+                "item": it,
+                "full": full,
+                "product_url": product_url,
+                "price_drop_pct": observations[item_id].drop_pct,
+            })
+
+    def link(offer, emit):
+        item_id, product_url = offer["item_id"], offer["product_url"]
+
+        # Gera link afiliado (cache primeiro, depois navegador, com fallback)
+        aff = links.get(product_url, item_id=item_id)
+        if not aff:
+            try:
+                if pool:
+                    aff = pool.gerar_um(product_url, permalink=product_url)
+                else:
+                    aff = lb.build_affiliate(product_url, permalink=product_url)
+            except Exception as e:
+                aff = None
+                print(f"[WARN] Afiliado falhou para {item_id}: {e}")
+            if aff:
+                links.put(product_url, aff, item_id=item_id)
+            else:
+                # Nunca cacheia vazio: a URL do produto vale só para este ciclo
+                aff = product_url
+
+        offer["aff"] = aff
+        offer["msg"] = format_offer(offer["full"] or offer["item"], aff)
+        emit(offer)
 
-                full = get_item_details(item_id)
-                product_url = full.get("permalink") or it.get("permalink")
-                if not product_url:
-                    continue
+    def media(offer, emit):
+        full, it = offer["full"], offer["item"]
 
-                # Gera link afiliado (com fallback)
+        # Imagem (URL → local para WhatsApp)
+        thumb_url = None
+        try:
+            thumb_url = full.get("pictures", [{}])[0].get("url") or it.get("thumbnail")
+        except Exception:
+            pass
+
+        local_img = None
+        if cfg.download_images and thumb_url:
+            try:
+                local_img = str(download_image(thumb_url, media_dir))
+            except Exception as e:
+                print(f"[WARN] Falha ao baixar imagem: {e}")
+
+        offer["thumb_url"], offer["local_img"] = thumb_url, local_img
+        emit(offer)
+
+    def publish(offer, emit):
+        # Segura a oferta até as anteriores passarem (uma oferta perdida numa
+        # etapa só é pulada no fim do ciclo, em flush_waiting)
+        with waiting_lock:
+            waiting[offer["seq"]] = offer
+            ready = []
+            while next_seq[0] in waiting:
+                ready.append(waiting.pop(next_seq[0]))
+                next_seq[0] += 1
+        publish_all(ready)
+
+    def flush_waiting():
+        with waiting_lock:
+            ready = [waiting.pop(k) for k in sorted(waiting)]
+        publish_all(ready)
+
+    def publish_all(ready):
+        # Uma oferta com erro não pode levar junto as que já saíram da fila
+        for o in ready:
+            try:
+                publish_one(o)
+            except Exception as e:
+                print(f"[WARN] Publicação falhou para {o['item_id']}: {e}")
+
+    def publish_one(offer):
+        msg, thumb_url, local_img = offer["msg"], offer["thumb_url"], offer["local_img"]
+
+        # Publicação (respeita DRY_RUN)
+        if cfg.dry_run:
+            print("---- DRY_RUN ----")
+            print(msg)
+            print(f"(TG chat={cfg.telegram_chat_id}) (WA={cfg.whatsapp_number}) (IMG={local_img})")
+        else:
+            # Telegram
+            if cfg.telegram_bot_token and cfg.telegram_chat_id:
                 try:
-                    aff = lb.build_affiliate(product_url)
+                    if thumb_url:
+                        tg.send_photo(cfg.telegram_bot_token, cfg.telegram_chat_id, photo_url=thumb_url, caption=msg)
+                    else:
+                        tg.send_message(cfg.telegram_bot_token, cfg.telegram_chat_id, msg)
                 except Exception as e:
-                    aff = product_url
-                    print(f"[WARN] Afiliado falhou para {item_id}: {e}")
+                    print(f"[WARN] Telegram: {e}")
 
-                msg = format_offer(full or it, aff)
-
-                # Imagem (URL → local para WhatsApp)
-                thumb_url = None
+            # WhatsApp
+            if cfg.whatsapp_number:
                 try:
-                    thumb_url = full.get("pictures", [{}])[0].get("url") or it.get("thumbnail")
-                except Exception:
-                    pass
-
-                local_img = None
-                if cfg.download_images and thumb_url:
-                    try:
-                        local_img = str(download_image(thumb_url, media_dir))
-                    except Exception as e:
-                        print(f"[WARN] Falha ao baixar imagem: {e}")
-
-                # Publicação (respeita DRY_RUN)
-                if cfg.dry_run:
-                    print("---- DRY_RUN ----")
-                    print(msg)
-                    print(f"(TG chat={cfg.telegram_chat_id}) (WA={cfg.whatsapp_number}) (IMG={local_img})")
-                else:
-                    # Telegram
-                    if cfg.telegram_bot_token and cfg.telegram_chat_id:
-                        try:
-                            if thumb_url:
-                                tg.send_photo(cfg.telegram_bot_token, cfg.telegram_chat_id, photo_url=thumb_url, caption=msg)
-                            else:
-                                tg.send_message(cfg.telegram_bot_token, cfg.telegram_chat_id, msg)
-                        except Exception as e:
-                            print(f"[WARN] Telegram: {e}")
-
-                    # WhatsApp
-                    if cfg.whatsapp_number:
-                        try:
-                            wa.send_whatsapp(cfg.whatsapp_number, msg, image_path=local_img)
-                        except Exception as e:
-                            print(f"[WARN] WhatsApp: {e}")
-
-                # Export / mark seen
-                exported_rows.append({
-                    "category": cat,
-                    "item_id": item_id,
-                    "title": full.get("title"),
-                    "price": full.get("price"),
-                    "affiliate_url": aff,
-                    "permalink": product_url
-                })
-                seen.add(item_id)
+                    wa.send_whatsapp(cfg.whatsapp_number, msg, image_path=local_img)
+                except Exception as e:
+                    print(f"[WARN] WhatsApp: {e}")
 
+        # Export / mark seen
+        row = {
+            "category": offer["category"],
+            "item_id": offer["item_id"],
+            "title": offer["full"].get("title"),
+            "price": offer["full"].get("price"),
+            "affiliate_url": offer["aff"],
+            "permalink": offer["product_url"],
+            "price_drop_pct": offer["price_drop_pct"],
+        }
+        with exported_lock:
+            exported_rows.append((offer["order"], row))
+        seen.add(offer["item_id"])
+
+    pipe = (
+        Pipeline(tamanho_fila=cfg.pipeline_queue_size)
+        .etapa("fetch", fetch, workers=cfg.ml_max_workers)
+        .etapa("enrich", enrich)
+        # Um LinkBuilder é uma aba só: mais de um worker por Chrome só faria fila
+        .etapa("link", link, workers=len(pool.workers) if pool else 1)
+        .etapa("media", media, workers=cfg.media_workers)
+        .etapa("publish", publish, workers=cfg.publish_workers)
+    )
+
+    try:
+        pipe.run(enumerate(cfg.categories))
+        if not pipe.parado:
+            flush_waiting()
     finally:
-        lb.close()
+        if pool:
+            pool.close()
+        else:
+            lb.close()
+        if cfg.whatsapp_number:
+            wa.close()
         seen.save()
+        seen.close()
+        history.close()
 
-    out = Path(__file__).resolve().parent.parent / "data" / "exports" / "ml_offers.csv"
-    x_poster.export_to_csv(exported_rows, out)
-    print(f"Export salvo em: {out}")
+        # Export na ordem categoria/posição, mesmo com o ciclo interrompido
+        out = Path(cfg.export_path) if cfg.export_path else data_dir / "exports" / "ml_offers.csv"
+        x_poster.export_to_csv([row for _, row in sorted(exported_rows, key=lambda r: r[0])], out)
+        print(f"Export salvo em: {out}")
 
 if __name__ == "__main__":
     build_and_publish()
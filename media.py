@@ -1,5 +1,10 @@
 from pathlib import Path
-import requests, hashlib
+import hashlib
+
+try:
+    from . import http_client
+except ImportError:  # executado como script solto
+    import http_client
 
 def download_image(url: str, out_dir: Path) -> Path:
     out_dir.mkdir(parents=True, exist_ok=True)
@@ -7,7 +12,7 @@ def download_image(url: str, out_dir: Path) -> Path:
     path = out_dir / name
     if path.exists():
         return path
-    r = requests.get(url, timeout=30)
+    r = http_client.get(url)
     r.raise_for_status()
     path.write_bytes(r.content)
     return path
@@ -1,23 +1,112 @@
-import time
-import requests
-from typing import Dict, List
-
-BASE = "https://api.mercadolibre.com"
-
-def _get(url: str, params: Dict=None, retries: int=3, timeout: int=15):
-    for i in range(retries):
-        r = requests.get(url, params=params, timeout=timeout)
-        if r.status_code == 200:
-            return r.json()
-        time.sleep(1.5 * (i+1))
+import os
+from typing import Dict, Iterable, Iterator, List, Optional
+
+try:
+    from .http_cache import default_cache
+    from . import ml_http
+except ImportError:  # executado como script solto (bot.py)
+    from http_cache import default_cache
+    import ml_http
+
+BASE = os.getenv("ML_API_BASE", "https://api.mercadolibre.com")
+
+# Validade do cache de respostas (segundos): busca muda rápido, item nem tanto
+SEARCH_CACHE_TTL = int(os.getenv("ML_SEARCH_CACHE_TTL", "300"))
+ITEM_CACHE_TTL = int(os.getenv("ML_ITEM_CACHE_TTL", "3600"))
+
+# A busca pública não pagina além deste offset
+SEARCH_MAX_OFFSET = 1000
+
+# Limite de IDs por chamada do multiget /items?ids=...
+MULTIGET_MAX_IDS = 20
+
+# Campos usados por message.format_offer e pelo export do main
+OFFER_ATTRIBUTES = ["id", "title", "price", "currency_id", "thumbnail", "pictures", "permalink"]
+
+def _get(url: str, params: Dict=None, retries: Optional[int]=None, timeout: int=15, ttl: int=0):
+    cache = default_cache() if ttl > 0 else None
+    key = entry = None
+    if cache:
+        key = cache.make_key(url, params)
+        entry = cache.get(key)
+        if entry and entry.is_fresh(ttl):
+            cache.record("hits")
+            return entry.body
+
+    headers = {"If-None-Match": entry.etag} if entry and entry.etag else None
+    r = ml_http.request("GET", url, params=params, headers=headers, timeout=timeout, retries=retries)
+    if r.status_code == 304 and entry:
+        cache.refresh(key)
+        cache.record("revalidated")
+        return entry.body
     r.raise_for_status()
+    data = r.json()
+    if cache:
+        cache.record("misses")
+        cache.put(key, url, data, etag=r.headers.get("ETag"))
+    return data
 
 def top_sellers_by_category(category_id: str, limit: int=5) -> List[Dict]:
     url = f"{BASE}/sites/MLB/search"
     params = {"category": category_id, "sort": "sold_quantity_desc", "limit": limit}
-    data = _get(url, params=params)
+    data = _get(url, params=params, ttl=SEARCH_CACHE_TTL)
     return data.get("results", [])
 
+def search_items(query: str, limit: int=50, offset: int=0) -> Dict:
+    """Busca textual em /sites/MLB/search (resposta crua, com cache)."""
+    url = f"{BASE}/sites/MLB/search"
+    params = {"q": query, "limit": limit, "offset": offset}
+    return _get(url, params=params, ttl=SEARCH_CACHE_TTL)
+
+def iter_search_pages(query: str, page_size: int=50, max_pages: Optional[int]=None) -> Iterator[List[Dict]]:
+    """Gera as páginas da busca sob demanda: a próxima só é baixada quando pedida."""
+    offset = 0
+    pages = 0
+    while True:
+        data = search_items(query, limit=page_size, offset=offset)
+        results = data.get("results", [])
+        if not results:
+            return
+        yield results
+
+        pages += 1
+        offset += len(results)
+        total = (data.get("paging") or {}).get("total")
+        if total is not None and offset >= total:
+            return
+        if offset >= SEARCH_MAX_OFFSET or (max_pages and pages >= max_pages):
+            return
+
+def iter_search(query: str, page_size: int=50, max_pages: Optional[int]=None) -> Iterator[Dict]:
+    """Itera item a item sobre iter_search_pages."""
+    for page in iter_search_pages(query, page_size=page_size, max_pages=max_pages):
+        yield from page
+
 def get_item_details(item_id: str) -> Dict:
     url = f"{BASE}/items/{item_id}"
-    return _get(url)
+    return _get(url, ttl=ITEM_CACHE_TTL)
+
+def get_items_details(item_ids: Iterable[str], attributes: Optional[List[str]]=None) -> Dict[str, Dict]:
+    """Busca detalhes de vários itens via multiget, em lotes de MULTIGET_MAX_IDS.
+
+    attributes limita os campos baixados (o "id" é sempre incluído para
+    devolver cada corpo ao seu item). Itens que a API não retornar com
+    code 200 simplesmente ficam fora do dicionário.
+    """
+    ids = list(dict.fromkeys(i for i in item_ids if i))
+    params_base = {}
+    if attributes:
+        attrs = list(dict.fromkeys(["id", *attributes]))
+        params_base["attributes"] = ",".join(attrs)
+
+    details: Dict[str, Dict] = {}
+    for start in range(0, len(ids), MULTIGET_MAX_IDS):
+        chunk = ids[start:start + MULTIGET_MAX_IDS]
+        params = {**params_base, "ids": ",".join(chunk)}
+        data = _get(f"{BASE}/items", params=params, ttl=ITEM_CACHE_TTL) or []
+        for entry in data:
+            body = entry.get("body") or {}
+            if entry.get("code") == 200 and body.get("id"):
+                details[body["id"]] = body
+    return details
+
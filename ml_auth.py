@@ -1,8 +1,9 @@
 import os
 import urllib.parse
-import requests
 from dotenv import load_dotenv
 
+from ml_http import request as ml_request
+
 load_dotenv()
 
 CLIENT_ID = os.getenv("ML_CLIENT_ID")
@@ -28,7 +29,8 @@ def trocar_code_por_token(code: str):
         "code": code,
         "redirect_uri": REDIRECT_URI,
     }
-    resp = requests.post(TOKEN_URL, data=data)
+    # O code é de uso único: repetir o POST só devolveria invalid_grant
+    resp = ml_request("POST", TOKEN_URL, retries=0, data=data)
     print("Status:", resp.status_code)
     print("Resposta JSON:", resp.text)
 
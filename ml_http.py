@@ -0,0 +1,128 @@
+import email.utils
+import os
+import random
+import threading
+import time
+from typing import Optional
+
+import requests
+
+try:
+    from . import http_client
+except ImportError:  # executado como script solto
+    import http_client
+
+# Cota de chamadas à API do Mercado Livre, compartilhada pelo processo inteiro
+ML_RATE_PER_SEC = float(os.getenv("ML_RATE_PER_SEC", "10"))
+ML_RATE_BURST = int(os.getenv("ML_RATE_BURST", "10"))
+
+# Retentativas: backoff exponencial com jitter, limitado a ML_BACKOFF_CAP
+ML_MAX_RETRIES = int(os.getenv("ML_MAX_RETRIES", "4"))
+ML_BACKOFF_BASE = float(os.getenv("ML_BACKOFF_BASE", "0.5"))
+ML_BACKOFF_CAP = float(os.getenv("ML_BACKOFF_CAP", "30"))
+
+# Teto para o Retry-After do servidor (um valor absurdo não trava o ciclo)
+ML_RETRY_AFTER_CAP = float(os.getenv("ML_RETRY_AFTER_CAP", "60"))
+
+RETRY_STATUS = {429, 500, 502, 503, 504}
+
+# Métodos que podem ser repetidos sem efeito colateral
+IDEMPOTENT_METHODS = {"GET", "HEAD", "OPTIONS", "PUT", "DELETE"}
+
+
+def _log(msg: str) -> None:
+    print(f"[ML] {msg}")
+
+
+class TokenBucket:
+    """Limitador token-bucket seguro para threads.
+
+    pause() bloqueia todos os consumidores até um instante (usado quando o
+    servidor devolve 429 com Retry-After).
+    """
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = max(rate, 0.001)
+        self.capacity = max(burst, 1)
+        self._tokens = float(self.capacity)
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self) -> None:
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                if now < self._paused_until:
+                    wait = self._paused_until - now
+                else:
+                    self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                    self._updated = now
+                    if self._tokens >= 1:
+                        self._tokens -= 1
+                        return
+                    wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+    def pause(self, seconds: float) -> None:
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+
+limiter = TokenBucket(ML_RATE_PER_SEC, ML_RATE_BURST)
+
+
+def _retry_after(resp: requests.Response) -> Optional[float]:
+    value = resp.headers.get("Retry-After")
+    if not value:
+        return None
+    try:
+        return min(ML_RETRY_AFTER_CAP, max(0.0, float(value)))
+    except ValueError:
+        pass
+    try:
+        when = email.utils.parsedate_to_datetime(value)
+        return min(ML_RETRY_AFTER_CAP, max(0.0, when.timestamp() - time.time()))
+    except (TypeError, ValueError):
+        return None
+
+
+def _backoff(attempt: int) -> float:
+    return random.uniform(0, min(ML_BACKOFF_CAP, ML_BACKOFF_BASE * (2 ** attempt)))
+
+
+def request(method: str, url: str, retries: Optional[int] = None, **kwargs) -> requests.Response:
+    """Faz uma chamada ao ML respeitando o limitador global.
+
+    Repete em erro de rede, 429 e 5xx (honrando Retry-After, até
+    ML_RETRY_AFTER_CAP); qualquer outra resposta, inclusive 4xx, volta na
+    hora para o chamador decidir. POST/PATCH só são repetidos se o chamador
+    pedir `retries` explicitamente.
+    """
+    if retries is None:
+        retries = ML_MAX_RETRIES if method.upper() in IDEMPOTENT_METHODS else 0
+    for attempt in range(retries + 1):
+        limiter.acquire()
+        try:
+            resp = http_client.request(method, url, **kwargs)
+        except (requests.ConnectionError, requests.Timeout) as e:
+            if attempt >= retries:
+                raise
+            wait = _backoff(attempt)
+            _log(f"[WARN] {type(e).__name__} em {url}; nova tentativa em {wait:.1f}s")
+            time.sleep(wait)
+            continue
+
+        if resp.status_code not in RETRY_STATUS or attempt >= retries:
+            return resp
+
+        wait = _retry_after(resp)
+        if wait is None:
+            wait = _backoff(attempt)
+        if resp.status_code == 429:
+            # Segura todo mundo, não só esta thread
+            limiter.pause(wait)
+        _log(f"[WARN] HTTP {resp.status_code} em {url}; nova tentativa em {wait:.1f}s")
+        time.sleep(wait)
+
+    return resp
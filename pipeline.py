@@ -0,0 +1,140 @@
+import queue
+import threading
+from typing import Any, Callable, Iterable, List
+
+try:
+    from .tracing import span
+except ImportError:  # executado como script solto
+    from tracing import span
+
+# Fim do fluxo: cada worker recebe um e sai
+_FIM = object()
+
+Emit = Callable[[Any], None]
+
+
+def _log(msg: str) -> None:
+    print(f"[PIPE] {msg}")
+
+
+class _Etapa:
+    def __init__(self, nome: str, fn: Callable[[Any, Emit], None], workers: int, tamanho_fila: int):
+        self.nome = nome
+        self.fn = fn
+        self.workers = max(1, workers)
+        self.fila: "queue.Queue" = queue.Queue(maxsize=max(1, tamanho_fila))
+        self.threads: List[threading.Thread] = []
+        self.vivos = self.workers
+        self.lock = threading.Lock()
+        self.processados = 0
+        self.erros = 0
+
+
+class Pipeline:
+    """
+    Etapas encadeadas por filas limitadas, cada uma com os seus workers
+    (threads). A função de uma etapa recebe (item, emit) e chama emit(x)
+    para cada saída (zero, uma ou várias) que segue para a próxima etapa.
+
+    - Backpressure: emit bloqueia quando a fila seguinte está cheia, então
+      uma etapa lenta segura as anteriores em vez de acumular memória.
+    - Erro num item: é logado e o item é descartado; a etapa continua.
+    - parar(): as etapas deixam de processar, mas continuam esvaziando as
+      filas até o fim do fluxo, para nenhuma thread ficar presa num put.
+    """
+
+    def __init__(self, tamanho_fila: int = 16):
+        self.tamanho_fila = tamanho_fila
+        self.etapas: List[_Etapa] = []
+        self._parar = threading.Event()
+
+    def etapa(self, nome: str, fn: Callable[[Any, Emit], None], workers: int = 1) -> "Pipeline":
+        self.etapas.append(_Etapa(nome, fn, workers, self.tamanho_fila))
+        return self
+
+    def parar(self) -> None:
+        self._parar.set()
+
+    @property
+    def parado(self) -> bool:
+        return self._parar.is_set()
+
+    def _emit_para(self, i: int) -> Emit:
+        if i + 1 >= len(self.etapas):
+            return lambda _x: None
+        proxima = self.etapas[i + 1].fila
+        return proxima.put
+
+    def _encerrar(self, i: int) -> None:
+        """Último worker da etapa i saiu: avisa os workers da etapa seguinte."""
+        if i + 1 < len(self.etapas):
+            proxima = self.etapas[i + 1]
+            for _ in range(proxima.workers):
+                proxima.fila.put(_FIM)
+
+    def _loop(self, i: int) -> None:
+        etapa = self.etapas[i]
+        emit = self._emit_para(i)
+        while True:
+            item = etapa.fila.get()
+            if item is _FIM:
+                break
+            if self._parar.is_set():
+                continue
+            try:
+                with span(f"pipeline.{etapa.nome}"):
+                    etapa.fn(item, emit)
+                with etapa.lock:
+                    etapa.processados += 1
+            except Exception as e:
+                with etapa.lock:
+                    etapa.erros += 1
+                _log(f"[WARN] Etapa '{etapa.nome}' falhou num item: {e}")
+        with etapa.lock:
+            etapa.vivos -= 1
+            ultimo = etapa.vivos == 0
+        if ultimo:
+            self._encerrar(i)
+
+    def run(self, entradas: Iterable[Any]) -> None:
+        """Alimenta a primeira etapa com `entradas` e espera o fluxo todo terminar."""
+        if not self.etapas:
+            return
+        for i, etapa in enumerate(self.etapas):
+            for n in range(etapa.workers):
+                t = threading.Thread(target=self._loop, args=(i,), name=f"{etapa.nome}-{n}", daemon=True)
+                etapa.threads.append(t)
+                t.start()
+
+        primeira = self.etapas[0]
+        try:
+            for item in entradas:
+                if self._parar.is_set():
+                    break
+                primeira.fila.put(item)
+        except BaseException:
+            self._parar.set()
+            raise
+        finally:
+            for _ in range(primeira.workers):
+                primeira.fila.put(_FIM)
+            self._aguardar()
+
+    def _aguardar(self) -> None:
+        try:
+            for etapa in self.etapas:
+                for t in etapa.threads:
+                    # join com timeout para o Ctrl+C continuar chegando
+                    while t.is_alive():
+                        t.join(timeout=0.5)
+        except BaseException:
+            # Interrompido enquanto esperava: drena sem processar e espera de novo
+            self._parar.set()
+            for etapa in self.etapas:
+                for t in etapa.threads:
+                    t.join()
+            raise
+        resumo = ", ".join(f"{e.nome}={e.processados}" + (f" ({e.erros} erro(s))" if e.erros else "")
+                           for e in self.etapas)
+        _log(f"Concluído: {resumo}")
+
@@ -1,6 +1,6 @@
-import requests
 from bs4 import BeautifulSoup
 
+import http_client
 from linkbuilder_selenium import gerar_link_afiliado
 from whatsapp_cloud_api import enviar_whatsapp_imagem, enviar_whatsapp_texto
 
@@ -12,18 +12,18 @@ def extrair_dados_produto(url_produto: str) -> dict:
       - imagem principal
       - preço (simples)
 
-    Primeiro tenta via requests; se der erro, devolve dados mínimos.
+    Primeiro tenta via HTTP (sessão compartilhada); se der erro, devolve dados mínimos.
     """
     headers = {
         "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64)"
     }
 
     try:
-        resp = requests.get(url_produto, headers=headers, timeout=20)
+        resp = http_client.get(url_produto, headers=headers)
         resp.raise_for_status()
     except Exception:
         # Se der erro, devolve um "fallback"
-        print("[PRODUTO] Não consegui baixar HTML via requests, usando dados mínimos.")
+        print("[PRODUTO] Não consegui baixar HTML via HTTP, usando dados mínimos.")
         return {
             "titulo": "Oferta no Mercado Livre",
             "img_url": "",
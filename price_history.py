@@ -0,0 +1,128 @@
+import json
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Iterable, Optional
+
+
+@dataclass
+class PriceObservation:
+    item_id: str
+    price: Optional[float]
+    previous_price: Optional[float]
+    min_price: Optional[float]  # menor preço visto ANTES desta observação
+
+    @property
+    def changed(self) -> bool:
+        return self.previous_price is None or self.previous_price != self.price
+
+    @property
+    def drop_pct(self) -> float:
+        """Quanto o preço atual está abaixo do menor preço já registrado (%)."""
+        if not self.price or not self.min_price or self.price >= self.min_price:
+            return 0.0
+        return round((1 - self.price / self.min_price) * 100, 2)
+
+
+class PriceHistory:
+    """
+    Histórico local de preços por item (SQLite).
+
+    - prices: uma linha por mudança de (price, original_price), indexada por
+      (item_id, ts);
+    - items: último preço visto, menor preço histórico e o último corpo de
+      detalhes baixado, para só pedir detalhes de novo quando o preço mudar.
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(
+            "CREATE TABLE IF NOT EXISTS prices ("
+            " item_id TEXT NOT NULL, ts REAL NOT NULL, price REAL, original_price REAL);"
+            "CREATE INDEX IF NOT EXISTS prices_item_ts ON prices(item_id, ts);"
+            "CREATE TABLE IF NOT EXISTS items ("
+            " item_id TEXT PRIMARY KEY, price REAL, original_price REAL, min_price REAL,"
+            " details TEXT, updated_at REAL);"
+        )
+        self._conn.commit()
+
+    def observe_many(self, items: Iterable[Dict]) -> Dict[str, PriceObservation]:
+        """Registra o preço de busca de cada item e devolve a comparação com o histórico."""
+        now = time.time()
+        result: Dict[str, PriceObservation] = {}
+        with self._lock:
+            for it in items:
+                item_id = it.get("id")
+                if not item_id or item_id in result:
+                    continue
+                price = it.get("price")
+                original = it.get("original_price")
+                row = self._conn.execute(
+                    "SELECT price, original_price, min_price FROM items WHERE item_id = ?", (item_id,)
+                ).fetchone()
+                prev_price, prev_original, min_price = row if row else (None, None, None)
+                obs = PriceObservation(item_id, price, prev_price, min_price)
+                result[item_id] = obs
+
+                if row and prev_price == price and prev_original == original:
+                    continue
+                self._conn.execute(
+                    "INSERT INTO prices (item_id, ts, price, original_price) VALUES (?, ?, ?, ?)",
+                    (item_id, now, price, original),
+                )
+                known = [p for p in (min_price, price) if p is not None]
+                new_min = min(known) if known else None
+                # Os detalhes guardados são do preço antigo: se o multiget de agora
+                # falhar, a próxima rodada (já sem mudança) tem que baixá-los de novo
+                self._conn.execute(
+                    "INSERT INTO items (item_id, price, original_price, min_price, updated_at)"
+                    " VALUES (?, ?, ?, ?, ?)"
+                    " ON CONFLICT(item_id) DO UPDATE SET price = excluded.price,"
+                    " original_price = excluded.original_price, min_price = excluded.min_price,"
+                    " details = NULL, updated_at = excluded.updated_at",
+                    (item_id, price, original, new_min, now),
+                )
+            self._conn.commit()
+        return result
+
+    def cached_details_many(self, item_ids: Iterable[str]) -> Dict[str, Dict]:
+        ids = list(dict.fromkeys(i for i in item_ids if i))
+        found: Dict[str, Dict] = {}
+        with self._lock:
+            for start in range(0, len(ids), 500):
+                chunk = ids[start:start + 500]
+                marks = ",".join("?" * len(chunk))
+                rows = self._conn.execute(
+                    f"SELECT item_id, details FROM items WHERE details IS NOT NULL AND item_id IN ({marks})",
+                    chunk,
+                ).fetchall()
+                for item_id, details in rows:
+                    found[item_id] = json.loads(details)
+        return found
+
+    def store_details_many(self, details: Dict[str, Dict]) -> None:
+        with self._lock:
+            self._conn.executemany(
+                "UPDATE items SET details = ? WHERE item_id = ?",
+                [(json.dumps(body, ensure_ascii=False), item_id) for item_id, body in details.items()],
+            )
+            self._conn.commit()
+
+    def history(self, item_id: str, limit: int = 100):
+        """Últimas mudanças de preço do item: [(ts, price, original_price), ...]."""
+        with self._lock:
+            return self._conn.execute(
+                "SELECT ts, price, original_price FROM prices WHERE item_id = ? ORDER BY ts DESC LIMIT ?",
+                (item_id, limit),
+            ).fetchall()
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
@@ -1,17 +1,24 @@
-import requests
+import os
 from typing import Optional
 
+try:
+    from .. import http_client
+except ImportError:  # publishers usado fora do pacote
+    import http_client
+
+TELEGRAM_API_BASE = os.getenv("TELEGRAM_API_BASE", "https://api.telegram.org")
+
 def send_message(bot_token: str, chat_id: str, text: str, parse_mode: str = "Markdown") -> None:
-    url = f"https://api.telegram.org/bot{bot_token}/sendMessage"
+    url = f"{TELEGRAM_API_BASE}/bot{bot_token}/sendMessage"
     data = {"chat_id": chat_id, "text": text, "parse_mode": parse_mode, "disable_web_page_preview": False}
-    r = requests.post(url, json=data, timeout=20)
+    r = http_client.post(url, json=data)
     r.raise_for_status()
 
 def send_photo(bot_token: str, chat_id: str, photo_url: str, caption: Optional[str] = None, parse_mode: str = "Markdown") -> None:
-    url = f"https://api.telegram.org/bot{bot_token}/sendPhoto"
+    url = f"{TELEGRAM_API_BASE}/bot{bot_token}/sendPhoto"
     data = {"chat_id": chat_id, "photo": photo_url}
     if caption:
         data["caption"] = caption
         data["parse_mode"] = parse_mode
-    r = requests.post(url, json=data, timeout=20)
+    r = http_client.post(url, json=data)
     r.raise_for_status()
@@ -1,14 +1,79 @@
+import os
+import threading
 from typing import Optional
-import pywhatkit as kit
-import time
 
-def send_whatsapp(number: str, message: str, image_path: Optional[str] = None):
-    """Envia via WhatsApp Web:
+from selenium.common.exceptions import InvalidSessionIdException, NoSuchWindowException
+
+try:
+    from .. import whatsapp as wpp
+    from ..linkbuilder_selenium import conectar_chrome
+except ImportError:  # publishers usado fora do pacote
+    import whatsapp as wpp
+    from linkbuilder_selenium import conectar_chrome
+
+# Chrome (já logado no WhatsApp Web) aberto com --remote-debugging-port
+WHATSAPP_DEBUG_PORT = int(os.getenv("WHATSAPP_DEBUG_PORT", "9222"))
+
+# Só estes erros garantem que nada foi enviado (o Chrome/aba morreu); num
+# timeout a mensagem pode ter saído, e repetir mandaria em dobro
+_ERROS_DE_SESSAO = (InvalidSessionIdException, NoSuchWindowException)
+
+_sessao: Optional[wpp.WhatsAppSession] = None
+_lock = threading.Lock()
+
+
+def _sessao_atual() -> wpp.WhatsAppSession:
+    global _sessao
+    if _sessao is None:
+        _sessao = wpp.WhatsAppSession(conectar_chrome(WHATSAPP_DEBUG_PORT))
+    return _sessao
+
+
+def _descartar_sessao() -> None:
+    global _sessao
+    if _sessao is not None:
+        try:
+            _sessao.close()
+        except Exception:
+            pass
+        _sessao = None
+
+
+def send_whatsapp(number: str, message: str, image_path: Optional[str] = None) -> wpp.ResultadoEnvio:
+    """Envia via WhatsApp Web, numa sessão do Chrome que fica aberta entre envios:
     - se image_path: envia imagem com legenda
     - caso contrário: envia texto
+
+    O chat do número fica aberto na aba do WhatsApp; só é recarregado se o
+    número mudar. Se a sessão do Chrome morreu, reconecta e tenta uma vez
+    mais. Levanta exceção se a mensagem não sair.
     """
-    if image_path:
-        kit.sendwhats_image(receiver=number, img_path=image_path, caption=message, wait_time=12, tab_close=True)
-    else:
-        kit.sendwhatmsg_instantly(phone_no=number, message=message, wait_time=10, tab_close=True)
-    time.sleep(5)
+    with _lock:
+        for tentativa in range(2):
+            try:
+                sessao = _sessao_atual()
+                sessao.selecionar_numero(number)
+                if image_path:
+                    resultado = wpp.enviar_imagem(sessao.driver, image_path, message,
+                                                  esperar_entrega=wpp.WPP_TIMEOUT_ENTREGA)
+                else:
+                    resultado = wpp.enviar_mensagem(sessao.driver, message,
+                                                    esperar_entrega=wpp.WPP_TIMEOUT_ENTREGA)
+                break
+            except _ERROS_DE_SESSAO as e:
+                if tentativa:
+                    raise
+                print(f"[WPP] [WARN] Sessão do WhatsApp caiu ({type(e).__name__}); reconectando...")
+                _descartar_sessao()
+
+    if resultado.status == "falhou":
+        raise RuntimeError(resultado.erro or "mensagem não enviada")
+    if not resultado.confirmado:
+        print(f"[WPP] [WARN] Sem confirmação de envio para {number} (status: {resultado.status}).")
+    return resultado
+
+
+def close() -> None:
+    """Fecha a aba do WhatsApp (o Chrome de debug continua aberto)."""
+    with _lock:
+        _descartar_sessao()
@@ -1,23 +1,350 @@
+from array import array
+from bisect import bisect_left
 from pathlib import Path
+from typing import Dict, Iterator, Optional, Tuple
 import json
+import math
+import os
+import re
+import struct
+import sys
+import threading
+import time
+
+_MLB_ID = re.compile(r"^MLB([1-9][0-9]{0,18})$")
+_SNAPSHOT_MAGIC = b"SEENBIN2"
+
+
+class BloomFilter:
+    """Bloom filter sobre inteiros (bytearray + hashing duplo)."""
+
+    def __init__(self, capacity: int, fp_rate: float = 0.01):
+        capacity = max(capacity, 1024)
+        self.m = max(8, int(-capacity * math.log(fp_rate) / (math.log(2) ** 2)))
+        self.k = max(1, round(self.m / capacity * math.log(2)))
+        self.capacity = capacity
+        self.count = 0
+        self.bits = bytearray((self.m + 7) // 8)
+
+    def _positions(self, n: int) -> Iterator[int]:
+        h1 = (n * 0x9E3779B97F4A7C15) & 0xFFFFFFFFFFFFFFFF
+        h2 = ((n ^ (n >> 31)) * 0xBF58476D1CE4E5B9 | 1) & 0xFFFFFFFFFFFFFFFF
+        for i in range(self.k):
+            yield (h1 + i * h2) % self.m
+
+    def add(self, n: int) -> None:
+        for pos in self._positions(n):
+            self.bits[pos >> 3] |= 1 << (pos & 7)
+        self.count += 1
+
+    def __contains__(self, n: int) -> bool:
+        return all(self.bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(n))
+
+    def to_bytes(self) -> bytes:
+        return struct.pack("<QQQQ", self.m, self.k, self.capacity, self.count) + bytes(self.bits)
+
+    @classmethod
+    def from_bytes(cls, raw: bytes) -> "BloomFilter":
+        bloom = cls.__new__(cls)
+        bloom.m, bloom.k, bloom.capacity, bloom.count = struct.unpack("<QQQQ", raw[:32])
+        bloom.bits = bytearray(raw[32:])
+        return bloom
+
+
+class CompactIndex:
+    """
+    Mapeamento id -> timestamp enxuto para milhões de IDs "MLB<número>".
+
+    A parte numérica fica num array('Q') ordenado, com os timestamps (em
+    segundos) num array('I') paralelo: ~12 bytes por entrada. Inclusões
+    recentes ficam num dict pequeno e são intercaladas em lote; IDs fora
+    do padrão MLB caem num dict comum. O Bloom filter opcional responde
+    "não visto" sem busca binária.
+    """
+
+    MERGE_AT = 4096
+
+    def __init__(self, bloom: bool = False):
+        self.ids = array("Q")
+        self.ts = array("I")
+        self.pending: Dict[int, int] = {}
+        self.extra: Dict[str, float] = {}
+        self.use_bloom = bloom
+        self.bloom: Optional[BloomFilter] = None
+        self._rebuild_bloom()
+
+    @staticmethod
+    def _parse(key: str) -> Optional[int]:
+        m = _MLB_ID.match(key)
+        return int(m.group(1)) if m else None
+
+    def _rebuild_bloom(self) -> None:
+        if not self.use_bloom:
+            return
+        # Monta ao lado e troca pronto: um filtro pela metade diria "não visto"
+        bloom = BloomFilter(2 * (len(self.ids) + len(self.pending)))
+        for n in self.ids:
+            bloom.add(n)
+        for n in self.pending:
+            bloom.add(n)
+        self.bloom = bloom
+
+    def _find(self, n: int) -> int:
+        i = bisect_left(self.ids, n)
+        return i if i < len(self.ids) and self.ids[i] == n else -1
+
+    def get(self, key: str) -> Optional[float]:
+        n = self._parse(key)
+        if n is None:
+            return self.extra.get(key)
+        if self.bloom is not None and n not in self.bloom:
+            return None
+        if n in self.pending:
+            return float(self.pending[n])
+        i = self._find(n)
+        return float(self.ts[i]) if i >= 0 else None
+
+    def __setitem__(self, key: str, ts: float) -> None:
+        n = self._parse(key)
+        if n is None:
+            self.extra[key] = ts
+            return
+        i = self._find(n)
+        if i >= 0:
+            self.ts[i] = int(ts)
+            return
+        self.pending[n] = int(ts)
+        if self.bloom is not None:
+            self.bloom.add(n)
+            if self.bloom.count > self.bloom.capacity:
+                self._merge()
+                self._rebuild_bloom()
+                return
+        if len(self.pending) >= self.MERGE_AT:
+            self._merge()
+
+    def _merge(self) -> None:
+        if not self.pending:
+            return
+        ids, ts = array("Q"), array("I")
+        prev = 0
+        for n, t in sorted(self.pending.items()):
+            i = bisect_left(self.ids, n, prev)
+            ids.extend(self.ids[prev:i])
+            ts.extend(self.ts[prev:i])
+            ids.append(n)
+            ts.append(t)
+            prev = i
+        ids.extend(self.ids[prev:])
+        ts.extend(self.ts[prev:])
+        self.ids, self.ts = ids, ts
+        self.pending = {}
+
+    @classmethod
+    def from_items(cls, items, bloom: bool = False) -> "CompactIndex":
+        """Monta o índice de uma vez (uma ordenação só), p/ migrar do JSON."""
+        index = cls(bloom=False)
+        numeric = {}
+        for key, ts in items:
+            n = cls._parse(key)
+            if n is None:
+                index.extra[key] = ts
+            else:
+                numeric[n] = int(ts)
+        for n in sorted(numeric):
+            index.ids.append(n)
+            index.ts.append(numeric[n])
+        index.use_bloom = bloom
+        index._rebuild_bloom()
+        return index
+
+    def __len__(self) -> int:
+        return len(self.ids) + len(self.pending) + len(self.extra)
+
+    def items(self) -> Iterator[Tuple[str, float]]:
+        self._merge()
+        for n, t in zip(self.ids, self.ts):
+            yield f"MLB{n}", float(t)
+        yield from self.extra.items()
+
+    def drop_older_than(self, cutoff: float) -> None:
+        self._merge()
+        keep = [i for i, t in enumerate(self.ts) if t >= cutoff]
+        if len(keep) != len(self.ts):
+            self.ids = array("Q", (self.ids[i] for i in keep))
+            self.ts = array("I", (self.ts[i] for i in keep))
+            self._rebuild_bloom()
+        self.extra = {k: t for k, t in self.extra.items() if t >= cutoff}
+
+    def dump(self, f) -> None:
+        """Grava o snapshot binário: cabeçalho, ids, timestamps, extras (JSON), Bloom."""
+        self._merge()
+        ids, ts = self.ids, self.ts
+        if sys.byteorder != "little":
+            ids, ts = array("Q", ids), array("I", ts)
+            ids.byteswap()
+            ts.byteswap()
+        extra = json.dumps(self.extra, ensure_ascii=False).encode("utf-8")
+        bloom = self.bloom.to_bytes() if self.bloom is not None else b""
+        f.write(struct.pack("<8sQQQ", _SNAPSHOT_MAGIC, len(ids), len(extra), len(bloom)))
+        f.write(ids.tobytes())
+        f.write(ts.tobytes())
+        f.write(extra)
+        f.write(bloom)
+
+    @classmethod
+    def load(cls, path: Path, bloom: bool = False) -> "CompactIndex":
+        index = cls(bloom=False)
+        with path.open("rb") as f:
+            magic, count, extra_len, bloom_len = struct.unpack("<8sQQQ", f.read(32))
+            if magic != _SNAPSHOT_MAGIC:
+                raise ValueError(f"snapshot inválido: {path}")
+            index.ids.frombytes(f.read(count * index.ids.itemsize))
+            index.ts.frombytes(f.read(count * index.ts.itemsize))
+            index.extra = json.loads(f.read(extra_len) or b"{}")
+            bloom_raw = f.read(bloom_len)
+        if sys.byteorder != "little":
+            index.ids.byteswap()
+            index.ts.byteswap()
+        index.use_bloom = bloom
+        if bloom and bloom_raw:
+            index.bloom = BloomFilter.from_bytes(bloom_raw)
+        else:
+            index._rebuild_bloom()
+        return index
+
 
 class SeenDB:
-    def __init__(self, path: Path):
+    """
+    IDs já publicados, com data de publicação.
+
+    Persistência em duas partes:
+      - snapshot JSON ({id: timestamp}) em `path`;
+      - log append-only (`path` + ".log"), uma linha por add(), com fsync,
+        para que um kill no meio do ciclo não perca o que já foi postado.
+    O log é incorporado ao snapshot (compactação) a cada `compact_every`
+    linhas e em save(). Com ttl_days, IDs mais velhos que isso voltam a
+    ser considerados novos e somem na próxima compactação.
+
+    compact=True troca o dict por um CompactIndex e o snapshot JSON por um
+    binário (`path` com sufixo .bin); o JSON existente é migrado na primeira
+    carga. Na carga vale sempre o mais novo dos dois snapshots, então ligar
+    e desligar o modo compacto não traz de volta IDs já publicados.
+    bloom=True coloca um Bloom filter na frente das consultas.
+    """
+
+    def __init__(self, path: Path, ttl_days: Optional[float] = None, compact_every: int = 1000,
+                 compact: bool = False, bloom: bool = False):
         self.path = path
         self.path.parent.mkdir(parents=True, exist_ok=True)
-        if self.path.exists():
+        self.log_path = path.with_name(path.name + ".log")
+        self.compact = compact
+        self.bloom = bloom
+        self.snapshot_path = path.with_suffix(".bin") if compact else path
+        self.ttl = ttl_days * 86400 if ttl_days else None
+        self.compact_every = compact_every
+        self._lock = threading.Lock()
+        self.data = self._load_snapshot()
+        self._log_lines = self._replay_log()
+        self._log = self.log_path.open("a", encoding="utf-8")
+
+    def _load_snapshot(self):
+        # SEEN_COMPACT pode ter mudado entre execuções: vale o snapshot mais novo
+        bin_path = self.path.with_suffix(".bin")
+        use_bin = bin_path.exists() and (
+            not self.path.exists() or bin_path.stat().st_mtime >= self.path.stat().st_mtime
+        )
+        if use_bin:
             try:
-                self.data = set(json.loads(self.path.read_text()))
-            except Exception:
-                self.data = set()
-        else:
-            self.data = set()
+                index = CompactIndex.load(bin_path, bloom=self.bloom)
+                return index if self.compact else dict(index.items())
+            except Exception as e:
+                print(f"[WARN] Snapshot binário ilegível ({e}); recarregando do JSON.")
+        data = self._load_json()
+        if not self.compact:
+            return data
+        return CompactIndex.from_items(data.items(), bloom=self.bloom)
+
+    def _load_json(self) -> Dict[str, float]:
+        if not self.path.exists():
+            return {}
+        try:
+            raw = json.loads(self.path.read_text())
+        except Exception:
+            return {}
+        if isinstance(raw, list):
+            # formato antigo: lista de IDs sem data
+            now = time.time()
+            return {str(k): now for k in raw}
+        return {str(k): float(v) for k, v in raw.items()}
+
+    def _replay_log(self) -> int:
+        if not self.log_path.exists():
+            return 0
+        raw = self.log_path.read_bytes()
+        fim = raw.rfind(b"\n") + 1
+        if fim < len(raw):
+            # Última linha cortada por um crash: sai do arquivo antes de voltar
+            # a anexar, senão o próximo registro gruda nela e se perde também
+            os.truncate(self.log_path, fim)
+        count = 0
+        for line in raw[:fim].decode("utf-8", errors="replace").splitlines():
+            key, sep, ts = line.partition("\t")
+            if not key or not sep:
+                continue
+            try:
+                self.data[key] = float(ts)
+            except ValueError:
+                continue
+            count += 1
+        return count
+
+    def _expired(self, ts: float, now: float) -> bool:
+        return self.ttl is not None and now - ts > self.ttl
 
     def has(self, key: str) -> bool:
-        return key in self.data
+        # O add() de outra thread pode estar no meio de um merge/rebuild
+        with self._lock:
+            ts = self.data.get(key)
+        return ts is not None and not self._expired(ts, time.time())
 
     def add(self, key: str):
-        self.data.add(key)
+        ts = time.time()
+        with self._lock:
+            self.data[key] = ts
+            self._log.write(f"{key}\t{ts}\n")
+            self._log.flush()
+            os.fsync(self._log.fileno())
+            self._log_lines += 1
+            if self._log_lines >= self.compact_every:
+                self._compact()
+
+    def _compact(self):
+        now = time.time()
+        tmp = self.snapshot_path.with_name(self.snapshot_path.name + ".tmp")
+        if self.compact:
+            if self.ttl is not None:
+                self.data.drop_older_than(now - self.ttl)
+            with tmp.open("wb") as f:
+                self.data.dump(f)
+                f.flush()
+                os.fsync(f.fileno())
+        else:
+            self.data = {k: ts for k, ts in self.data.items() if not self._expired(ts, now)}
+            with tmp.open("w", encoding="utf-8") as f:
+                json.dump(self.data, f, ensure_ascii=False, separators=(",", ":"))
+                f.flush()
+                os.fsync(f.fileno())
+        os.replace(tmp, self.snapshot_path)
+        # Só depois do snapshot no disco o log pode ser zerado
+        self._log.close()
+        self._log = self.log_path.open("w", encoding="utf-8")
+        self._log_lines = 0
 
     def save(self):
-        self.path.write_text(json.dumps(sorted(self.data), ensure_ascii=False, indent=2))
+        with self._lock:
+            self._compact()
+
+    def close(self):
+        with self._lock:
+            self._log.close()
@@ -0,0 +1,201 @@
+"""
+Medição leve de tempo por etapa (spans).
+
+    with span("link.canonica", url=url) as s:
+        ...
+        s["seletor"] = sel          # atributos extras entram no registro
+
+Cada span vira uma linha JSON em TRACE_PATH (se definido) e alimenta um
+agregado em memória de tamanho fixo (contagem, total, máximo e histograma
+exatos; percentis de uma amostra de até TRACE_AMOSTRA medições por etapa);
+resumo() / imprimir_resumo() mostram esse agregado. Para um arquivo já gravado:
+
+    python tracing.py data/trace.jsonl
+"""
+import atexit
+import bisect
+import functools
+import json
+import os
+import random
+import sys
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+# Arquivo JSONL das medições (vazio = só o agregado em memória)
+TRACE_PATH = os.getenv("TRACE_PATH", "")
+
+# Limites (ms) das faixas do histograma
+BUCKETS_MS = [10, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000, 60000]
+
+# Medições guardadas por etapa para os percentis (processos longos não crescem)
+TRACE_AMOSTRA = int(os.getenv("TRACE_AMOSTRA", "2048"))
+
+
+class _Agregado:
+    """Contagem, total, máximo e histograma exatos + amostra uniforme (reservoir)."""
+
+    __slots__ = ("n", "total", "maximo", "histograma", "amostra")
+
+    def __init__(self):
+        self.n = 0
+        self.total = 0.0
+        self.maximo = 0.0
+        self.histograma = [0] * (len(BUCKETS_MS) + 1)
+        self.amostra: List[float] = []
+
+    def add(self, ms: float) -> None:
+        self.n += 1
+        self.total += ms
+        self.maximo = max(self.maximo, ms)
+        self.histograma[bisect.bisect_left(BUCKETS_MS, ms)] += 1
+        if len(self.amostra) < TRACE_AMOSTRA:
+            self.amostra.append(ms)
+        else:
+            i = random.randrange(self.n)
+            if i < TRACE_AMOSTRA:
+                self.amostra[i] = ms
+
+    def copia(self) -> "_Agregado":
+        c = _Agregado()
+        c.n, c.total, c.maximo = self.n, self.total, self.maximo
+        c.histograma, c.amostra = list(self.histograma), list(self.amostra)
+        return c
+
+
+_lock = threading.Lock()
+_local = threading.local()
+_agregados: Dict[str, _Agregado] = defaultdict(_Agregado)
+_arquivo = None
+
+
+def _log(msg: str) -> None:
+    print(f"[TRACE] {msg}")
+
+
+def _pilha() -> List[str]:
+    if not hasattr(_local, "pilha"):
+        _local.pilha = []
+    return _local.pilha
+
+
+def _gravar(registro: Dict) -> None:
+    global _arquivo
+    with _lock:
+        _agregados[registro["nome"]].add(registro["ms"])
+        if not TRACE_PATH:
+            return
+        if _arquivo is None:
+            path = Path(TRACE_PATH)
+            path.parent.mkdir(parents=True, exist_ok=True)
+            _arquivo = path.open("a", encoding="utf-8")
+            atexit.register(imprimir_resumo)
+        _arquivo.write(json.dumps(registro, ensure_ascii=False, default=str) + "\n")
+        _arquivo.flush()
+
+
+@contextmanager
+def span(nome: str, **attrs):
+    """Mede o bloco; o dict devolvido aceita atributos extras até o fim do bloco."""
+    pilha = _pilha()
+    pai = pilha[-1] if pilha else None
+    pilha.append(nome)
+    inicio = time.perf_counter()
+    erro = None
+    try:
+        yield attrs
+    except BaseException as e:
+        erro = type(e).__name__
+        raise
+    finally:
+        pilha.pop()
+        registro = {
+            "ts": round(time.time(), 3),
+            "nome": nome,
+            "ms": round((time.perf_counter() - inicio) * 1000, 2),
+            "pai": pai,
+            "thread": threading.current_thread().name,
+        }
+        if attrs:
+            registro["attrs"] = attrs
+        if erro:
+            registro["erro"] = erro
+        _gravar(registro)
+
+
+def traced(nome: str) -> Callable:
+    """Decorador: cada chamada da função vira um span `nome`."""
+    def deco(fn: Callable) -> Callable:
+        @functools.wraps(fn)
+        def medido(*args, **kwargs):
+            with span(nome):
+                return fn(*args, **kwargs)
+        return medido
+    return deco
+
+
+def _percentil(ordenados: List[float], pct: float) -> float:
+    idx = min(len(ordenados) - 1, max(0, round(pct / 100 * (len(ordenados) - 1))))
+    return ordenados[idx]
+
+
+def _resumir(agregados: Dict[str, _Agregado]) -> Dict[str, Dict]:
+    saida = {}
+    for nome, ag in agregados.items():
+        if not ag.n:
+            continue
+        ordenados = sorted(ag.amostra)
+        saida[nome] = {
+            "n": ag.n,
+            "total_ms": round(ag.total, 1),
+            "p50_ms": _percentil(ordenados, 50),
+            "p90_ms": _percentil(ordenados, 90),
+            "p99_ms": _percentil(ordenados, 99),
+            "max_ms": ag.maximo,
+            "histograma": ag.histograma,
+        }
+    return saida
+
+
+def resumo() -> Dict[str, Dict]:
+    """Agregado das medições deste processo, por nome de span."""
+    with _lock:
+        copia = {k: v.copia() for k, v in _agregados.items()}
+    return _resumir(copia)
+
+
+def resumo_de_arquivo(path: Path) -> Dict[str, Dict]:
+    agregados: Dict[str, _Agregado] = defaultdict(_Agregado)
+    with Path(path).open(encoding="utf-8") as f:
+        for linha in f:
+            try:
+                registro = json.loads(linha)
+            except ValueError:
+                continue
+            agregados[registro["nome"]].add(registro["ms"])
+    return _resumir(agregados)
+
+
+def imprimir_resumo(dados: Optional[Dict[str, Dict]] = None) -> None:
+    dados = resumo() if dados is None else dados
+    if not dados:
+        return
+    faixas = [f"<{b}" for b in BUCKETS_MS] + [f">={BUCKETS_MS[-1]}"]
+    _log(f"{'etapa':<24} {'n':>6} {'p50 ms':>10} {'p90 ms':>10} {'p99 ms':>10} {'total ms':>12}")
+    for nome, r in sorted(dados.items(), key=lambda kv: -kv[1]["total_ms"]):
+        _log(f"{nome:<24} {r['n']:>6} {r['p50_ms']:>10} {r['p90_ms']:>10} {r['p99_ms']:>10} {r['total_ms']:>12}")
+        maior = max(r["histograma"]) or 1
+        for faixa, qtd in zip(faixas, r["histograma"]):
+            if qtd:
+                _log(f"    {faixa:>8} ms {'#' * max(1, round(qtd / maior * 30))} {qtd}")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 2:
+        print("uso: python tracing.py <trace.jsonl>")
+        sys.exit(1)
+    imprimir_resumo(resumo_de_arquivo(Path(sys.argv[1])))
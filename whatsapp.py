@@ -1,16 +1,34 @@
 # -*- coding: utf-8 -*-
+import json
+import os
+import re
+import threading
 import time
-from typing import Optional, List
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, Optional, List
 
 from selenium.webdriver.common.by import By
 from selenium.webdriver.common.keys import Keys
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
-from selenium.common.exceptions import TimeoutException
+from selenium.common.exceptions import StaleElementReferenceException, TimeoutException, WebDriverException
+
+try:
+    from .tracing import span, traced
+except ImportError:  # executado como script solto (bot_ofertas.py etc.)
+    from tracing import span, traced
 
 
 WPP_URL = "https://web.whatsapp.com/"
 
+# Último seletor que funcionou para cada elemento da interface
+WPP_SELETORES_PATH = Path(os.getenv("WPP_SELETORES_PATH", "data/wpp_seletores.json"))
+
+# Quanto esperar (s) as mensagens de um lote saírem do relógio (pendente)
+WPP_TIMEOUT_ENTREGA = float(os.getenv("WPP_TIMEOUT_ENTREGA", "30"))
+
 
 def _log(msg: str) -> None:
     print(f"[WPP] {msg}")
@@ -26,6 +44,89 @@ def _remove_non_bmp(text: str) -> str:
     return "".join(ch for ch in text if ord(ch) <= 0xFFFF)
 
 
+# Seletores amplos demais para serem lembrados: acham o elemento certo só
+# por estarem no fim da lista (ex: o campo de mensagem também casa com a busca)
+_SELETORES_GENERICOS = {
+    "div[contenteditable='true']",
+    "div[contenteditable='true'][role='textbox']",
+    "div[role='textbox'][contenteditable='true']",
+    "div[contenteditable='true'][data-tab]",
+    "footer div[contenteditable='true']",
+    "header",
+}
+
+
+class RegistroSeletores:
+    """
+    Lembra (em JSON) qual seletor funcionou por último para cada elemento
+    da interface; esse seletor passa a ser testado primeiro. Seletores
+    genéricos (_SELETORES_GENERICOS) nunca são lembrados.
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        self._lock = threading.Lock()
+        try:
+            self._dados: Dict[str, str] = json.loads(path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            self._dados = {}
+
+    def ordenar(self, elemento: str, seletores: List[str]) -> List[str]:
+        preferido = self._dados.get(elemento)
+        if preferido in seletores and preferido not in _SELETORES_GENERICOS:
+            return [preferido] + [s for s in seletores if s != preferido]
+        return list(seletores)
+
+    def lembrar(self, elemento: str, seletor: str) -> None:
+        if seletor in _SELETORES_GENERICOS:
+            return
+        with self._lock:
+            if self._dados.get(elemento) == seletor:
+                return
+            self._dados[elemento] = seletor
+            try:
+                self.path.parent.mkdir(parents=True, exist_ok=True)
+                tmp = self.path.with_suffix(".tmp")
+                tmp.write_text(json.dumps(self._dados, ensure_ascii=False, indent=2), encoding="utf-8")
+                os.replace(tmp, self.path)
+            except OSError as e:
+                _log(f"[WARN] Não consegui salvar {self.path}: {e}")
+
+
+registro_seletores = RegistroSeletores(WPP_SELETORES_PATH)
+
+
+@contextmanager
+def _sem_espera_implicita(driver):
+    """Zera o implicitly_wait durante a sondagem (cada find_element volta na hora)."""
+    try:
+        anterior = driver.timeouts.implicit_wait
+    except Exception:
+        anterior = 0
+    driver.implicitly_wait(0)
+    try:
+        yield
+    finally:
+        driver.implicitly_wait(anterior)
+
+
+@contextmanager
+def _script_timeout(driver, segundos: float):
+    """Troca o timeout de scripts assíncronos só durante o bloco (Chrome compartilhado)."""
+    try:
+        anterior = driver.timeouts.script
+    except Exception:
+        anterior = 30  # padrão do WebDriver
+    driver.set_script_timeout(segundos)
+    try:
+        yield
+    finally:
+        try:
+            driver.set_script_timeout(anterior)
+        except WebDriverException:
+            pass
+
+
 def _esperar_elemento(
     driver,
     by: By,
@@ -38,41 +139,69 @@ def _esperar_elemento(
     )
 
 
+def _esperar_ate(driver, condicao, timeout: float, intervalo: float = 0.1) -> bool:
+    """Espera `condicao(driver)` ficar verdadeira; False no timeout (sem exceção)."""
+    try:
+        WebDriverWait(driver, timeout, poll_frequency=intervalo).until(condicao)
+        return True
+    except TimeoutException:
+        return False
+
+
 def _tentar_seletores(
     driver,
     seletores: List[str],
     timeout_total: int = 30,
     cond=EC.visibility_of_element_located,
+    elemento: Optional[str] = None,
+    by: str = By.CSS_SELECTOR,
+    lembrar: bool = True,
 ) -> Optional[object]:
-    inicio = time.time()
-    ultima_exc = None
-
-    for sel in seletores:
-        restante = timeout_total - (time.time() - inicio)
-        if restante <= 0:
-            break
-
+    """
+    Sonda todos os seletores a cada rodada (o lembrado em `elemento`
+    primeiro) e devolve o primeiro elemento que atender `cond`. Um seletor
+    velho não consome mais uma fatia do timeout antes do que funciona.
+    Com lembrar=False a ordem da lista vale sempre e nada é gravado.
+    """
+    lembrar = lembrar and bool(elemento)
+    ordem = registro_seletores.ordenar(elemento, seletores) if lembrar else list(seletores)
+    achado: Dict[str, object] = {}
+
+    def _primeiro(d):
+        for i, sel in enumerate(ordem):
+            try:
+                elem = cond((by, sel))(d)
+            except WebDriverException:
+                elem = False
+            if elem:
+                achado["seletor"], achado["posicao"] = sel, i
+                return elem
+        return False
+
+    # Um span por papel: "campo" e "enviar" têm latências bem diferentes
+    with span(f"wpp.seletor.{elemento or 'outro'}", candidatos=len(ordem)) as s:
+        _log(f"Procurando {elemento or 'elemento'} ({len(ordem)} seletores)...")
         try:
-            _log(f"Tentando seletor: {sel}")
-            elem = WebDriverWait(driver, restante).until(
-                cond((By.CSS_SELECTOR, sel))
-            )
-            _log(f"Elemento encontrado com seletor: {sel}")
-            return elem
-        except Exception as e:
-            ultima_exc = e
-            _log(f"[WARN] Falha com seletor {sel}: {type(e).__name__}")
-
-    if ultima_exc:
-        _log("[ERRO] Não foi possível localizar o elemento com os seletores testados.")
-        _log(str(ultima_exc))
-    return None
+            with _sem_espera_implicita(driver):
+                elem = WebDriverWait(driver, timeout_total, poll_frequency=0.2).until(_primeiro)
+        except TimeoutException as e:
+            s["seletor"] = None
+            _log("[ERRO] Não foi possível localizar o elemento com os seletores testados.")
+            _log(str(e))
+            return None
+        s.update(achado)
+
+    _log(f"Elemento encontrado com seletor: {achado['seletor']}")
+    if lembrar:
+        registro_seletores.lembrar(elemento, achado["seletor"])
+    return elem
 
 
 # ======================================================================
 #   ABRIR WHATSAPP
 # ======================================================================
 
+@traced("wpp.abrir")
 def abrir_whatsapp(driver) -> None:
     _log(f"Abrindo WhatsApp Web: {WPP_URL}")
     driver.get(WPP_URL)
@@ -86,6 +215,7 @@ def abrir_whatsapp(driver) -> None:
                 "header",
             ],
             timeout_total=60,
+            elemento="carregado",
         )
         _log("WhatsApp Web carregado.")
     except Exception:
@@ -97,6 +227,94 @@ def abrir_whatsapp(driver) -> None:
 #   BUSCAR E ABRIR CONVERSA
 # ======================================================================
 
+# Compara títulos sem os emojis fora do BMP (que não passam pelo
+# ChromeDriver) e sem espaços nas pontas: "Ofertas" não casa com "Ofertas 2"
+_JS_MESMO_TITULO = """
+const semEmoji = (t) => Array.from(t || '').filter((c) => c.codePointAt(0) <= 0xFFFF).join('').trim();
+const mesmoTitulo = (el, nome) => semEmoji(el.getAttribute('title')) === nome;
+"""
+
+
+def conversa_aberta(driver, nome_conversa: str) -> bool:
+    """
+    True se o título do chat aberto é exatamente `nome_conversa` (sem
+    esperar: uma única leitura via script).
+    """
+    texto = _remove_non_bmp(nome_conversa).strip()
+    try:
+        return bool(driver.execute_script(
+            _JS_MESMO_TITULO
+            + "return Array.from(document.querySelectorAll('#main header span[title]'))"
+              ".some((el) => mesmoTitulo(el, arguments[0]));",
+            texto,
+        ))
+    except Exception:
+        return False
+
+
+# Procura o chat entre as entradas já carregadas na barra lateral
+_JS_CONVERSA_NA_LISTA = _JS_MESMO_TITULO + """
+for (const el of document.querySelectorAll('#pane-side span[title]')) {
+  if (mesmoTitulo(el, arguments[0])) { el.scrollIntoView({block: 'center'}); return el; }
+}
+return null;
+"""
+
+
+def abrir_conversa_pela_lista(driver, nome_conversa: str) -> bool:
+    """
+    Abre o chat clicando na entrada da barra lateral, sem usar a busca.
+    False se ele não estiver entre as entradas carregadas.
+    """
+    texto = _remove_non_bmp(nome_conversa).strip()
+    try:
+        elem = driver.execute_script(_JS_CONVERSA_NA_LISTA, texto)
+        if not elem:
+            return False
+        elem.click()
+    except WebDriverException:
+        return False
+    return _esperar_ate(driver, lambda d: conversa_aberta(d, texto), timeout=5)
+
+
+def _limpar_busca(driver) -> None:
+    """Esvazia a busca para a barra lateral voltar a listar todos os chats."""
+    try:
+        campo = driver.execute_script("return document.querySelector(\"#side div[contenteditable='true']\");")
+        if campo and _texto_do_campo(driver, campo):
+            _limpar_campo(campo)
+    except WebDriverException:
+        pass
+
+
+# Títulos das entradas da barra lateral, para saber quando a lista parou de mudar
+_JS_TITULOS_DA_LISTA = """
+const p = document.querySelector('#pane-side');
+return p ? Array.from(p.querySelectorAll('span[title]'), (el) => el.getAttribute('title')).join('\\n') : '';
+"""
+
+
+def _esperar_lista_assentar(driver, timeout: float = 5, estavel: float = 0.4) -> bool:
+    """
+    Espera a barra lateral ficar `estavel` segundos sem mudar (a busca
+    refaz a lista depois de cada tecla). False se não assentar no timeout.
+    """
+    estado = {"titulos": None, "desde": time.time()}
+
+    def _assentou(d):
+        try:
+            titulos = d.execute_script(_JS_TITULOS_DA_LISTA)
+        except WebDriverException:
+            return False
+        agora = time.time()
+        if titulos != estado["titulos"]:
+            estado["titulos"], estado["desde"] = titulos, agora
+            return False
+        return agora - estado["desde"] >= estavel
+
+    return _esperar_ate(driver, _assentou, timeout=timeout)
+
+
 def _obter_campo_busca(driver):
     seletores_busca = [
         "div[contenteditable='true'][role='textbox']",
@@ -104,13 +322,16 @@ def _obter_campo_busca(driver):
         "div[contenteditable='true'][data-tab]",
         "div[contenteditable='true']",
     ]
-    return _tentar_seletores(driver, seletores_busca, timeout_total=30)
+    return _tentar_seletores(driver, seletores_busca, timeout_total=30, elemento="busca")
 
 
+@traced("wpp.conversa")
 def abrir_conversa(driver, nome_conversa: str) -> None:
     """
-    Usa a barra de busca para localizar e abrir a conversa.
-    Busca por PARTE do título (contains) para não depender de emoji.
+    Usa a barra de busca para localizar e abrir a conversa. Clica no
+    resultado de título igual ao nome; só se não houver, num que contenha o
+    nome (títulos com emoji, que não passa pelo ChromeDriver). Levanta
+    TimeoutException se o cabeçalho não confirmar exatamente essa conversa.
     """
     _log(f"Abrindo conversa com: '{nome_conversa}'")
 
@@ -119,40 +340,49 @@ def abrir_conversa(driver, nome_conversa: str) -> None:
         raise TimeoutException("Não foi possível encontrar o campo de busca.")
 
     texto_busca = _remove_non_bmp(nome_conversa)
-    campo_busca.click()
-    campo_busca.clear()
-    campo_busca.send_keys(texto_busca)
-    time.sleep(1.8)
-
-    # Procurar por span cujo title contém esse texto
+    with span("wpp.busca"):
+        campo_busca.click()
+        campo_busca.clear()
+        campo_busca.send_keys(texto_busca)
+
+    # Procurar o span com esse title (espera o resultado da busca aparecer,
+    # em vez de um sleep fixo). Só depois de a lista parar de mudar: antes
+    # disso o item achado pode ser de uma lista que a busca ainda vai refazer.
+    # A ordem importa (exato antes de contains), então nada vai para o registro.
     xpaths = [
+        f"//div[@id='pane-side']//span[@title=\"{texto_busca.strip()}\"]",
         f"//span[contains(@title, \"{texto_busca}\")]",
         f"//div[@role='gridcell']//span[contains(@title, \"{texto_busca}\")]",
         f"//span[@dir='auto' and contains(., \"{texto_busca}\")]",
     ]
-
-    conversa_elem = None
-    ultima_exc = None
-    for xp in xpaths:
+    for tentativa in range(2):
+        if not _esperar_lista_assentar(driver):
+            _log("[WARN] A lista de conversas não parou de mudar; seguindo assim mesmo.")
+        conversa_elem = _tentar_seletores(
+            driver,
+            xpaths,
+            timeout_total=15,
+            cond=EC.element_to_be_clickable,
+            elemento="conversa",
+            by=By.XPATH,
+            lembrar=False,
+        )
+        if not conversa_elem:
+            _log(f"[ERRO] Não achei a conversa contendo: '{texto_busca}'")
+            raise TimeoutException(f"Conversa contendo '{texto_busca}' não encontrada.")
         try:
-            _log(f"Tentando localizar conversa com XPath: {xp}")
-            conversa_elem = WebDriverWait(driver, 15).until(
-                EC.element_to_be_clickable((By.XPATH, xp))
-            )
+            conversa_elem.click()
             break
-        except Exception as e:
-            ultima_exc = e
-            _log(f"[WARN] Conversa não encontrada com XPath: {xp}")
-
-    if not conversa_elem:
-        _log(f"[ERRO] Não achei a conversa contendo: '{texto_busca}'")
-        if ultima_exc:
-            _log(str(ultima_exc))
-        raise TimeoutException(f"Conversa contendo '{texto_busca}' não encontrada.")
-
-    conversa_elem.click()
-    _log(f"Conversa contendo '{texto_busca}' aberta.")
-    time.sleep(1.5)
+        except StaleElementReferenceException:
+            if tentativa:
+                raise
+            _log("[WARN] Resultado da busca mudou antes do clique; procurando de novo...")
+    # Pronto quando o cabeçalho do chat mostrar o nome
+    if not _esperar_ate(driver, lambda d: conversa_aberta(d, texto_busca), timeout=15):
+        # Um contains pode ter aberto "Ofertas 2" no lugar de "Ofertas"
+        _log(f"[ERRO] Cabeçalho não confirmou a conversa '{texto_busca}'.")
+        raise TimeoutException(f"Conversa '{texto_busca}' não confirmada no cabeçalho.")
+    _log(f"Conversa '{texto_busca}' aberta.")
 
 
 # ======================================================================
@@ -172,6 +402,7 @@ def _obter_campo_mensagem(driver):
         seletores=seletores_mensagem,
         timeout_total=30,
         cond=EC.visibility_of_element_located,
+        elemento="mensagem",
     )
 
 
@@ -188,48 +419,518 @@ def _obter_botao_enviar(driver):
         seletores=seletores_botao,
         timeout_total=10,
         cond=EC.element_to_be_clickable,
+        elemento="botao_enviar",
     )
 
 def _encontrar_campo_mensagem(driver, timeout: int = 30):
     """
     Tenta encontrar o campo de mensagem do WhatsApp Web usando vários seletores.
     """
+    # Sempre dentro do rodapé do chat: fora dele, o mesmo seletor acha a busca
     seletores = [
-        "div[contenteditable='true'][role='textbox']",                 # mais moderno
-        "footer div[contenteditable='true'][contenteditable='true']",  # fallback genérico
-        "footer div[contenteditable='true'][data-tab='10']",           # seletor antigo
+        "#main footer div[contenteditable='true'][role='textbox']",  # mais moderno
+        "footer div[contenteditable='true'][data-tab='10']",         # seletor antigo
+        "footer div[contenteditable='true']",                        # fallback genérico
     ]
 
-    for sel in seletores:
+    campo = _tentar_seletores(
+        driver,
+        seletores,
+        timeout_total=timeout,
+        cond=EC.presence_of_element_located,
+        elemento="campo_mensagem",
+    )
+    if campo is None:
+        raise TimeoutException("Campo de mensagem não encontrado.")
+    return campo
+
+
+# Cola o texto de uma vez, como um Ctrl+V do usuário: o editor do WhatsApp
+# trata o evento de paste (mantém quebras de linha e emojis fora do BMP).
+_JS_COLAR_TEXTO = """
+const el = arguments[0], texto = arguments[1];
+el.focus();
+const dados = new DataTransfer();
+dados.setData('text/plain', texto);
+el.dispatchEvent(new ClipboardEvent('paste', {clipboardData: dados, bubbles: true, cancelable: true}));
+"""
+
+# Texto do editor com cada emoji de volta no lugar: o WhatsApp troca o
+# caractere por um <img alt="😀">, que o innerText não devolve
+_JS_TEXTO_COM_EMOJIS = """
+let texto = '';
+const andar = (no) => {
+  for (const filho of no.childNodes) {
+    if (filho.nodeType === Node.TEXT_NODE) texto += filho.nodeValue;
+    else if (filho.nodeName === 'IMG') texto += filho.getAttribute('alt') || '';
+    else andar(filho);
+  }
+};
+andar(arguments[0]);
+return texto;
+"""
+
+
+def _comparavel(texto: str) -> str:
+    """Sem espaços/quebras (o editor reorganiza em parágrafos) nem seletores de variação de emoji."""
+    return "".join(ch for ch in texto if not ch.isspace() and ch not in "\ufe0f\u200d")
+
+
+def _limpar_campo(campo) -> None:
+    campo.send_keys(Keys.CONTROL, "a")
+    campo.send_keys(Keys.DELETE)
+
+
+def _colar_texto(driver, campo, texto: str, timeout: float = 2) -> bool:
+    """
+    Insere o texto inteiro numa única operação (paste sintético). True se,
+    em até `timeout` s, o editor ficar com exatamente esse texto (o editor
+    aplica o paste de forma assíncrona).
+    """
+    try:
+        driver.execute_script(_JS_COLAR_TEXTO, campo, texto)
+    except WebDriverException as e:
+        _log(f"[WARN] Paste sintético falhou: {type(e).__name__}")
+        return False
+    esperado = _comparavel(texto)
+
+    def _conferiu(d) -> bool:
         try:
-            print(f"[WPP] Tentando seletor de mensagem: {sel}")
-            campo = WebDriverWait(driver, timeout).until(
-                EC.presence_of_element_located((By.CSS_SELECTOR, sel))
-            )
-            print(f"[WPP] Campo de mensagem encontrado com seletor: {sel}")
-            return campo
-        except TimeoutException:
-            print(f"[WPP] [WARN] Falha com seletor {sel}: TimeoutException")
+            return _comparavel(d.execute_script(_JS_TEXTO_COM_EMOJIS, campo) or "") == esperado
+        except WebDriverException:
+            return False
+
+    return _esperar_ate(driver, _conferiu, timeout=timeout)
+
+
+def _inserir_texto(driver, campo, texto: str) -> None:
+    """Cola o texto; se o editor não conferir, esvazia o campo e digita."""
+    with span("wpp.inserir") as s:
+        s["modo"] = "paste"
+        if _colar_texto(driver, campo, texto):
+            return
+        _log("[WARN] Paste não conferiu; digitando o texto.")
+        s["modo"] = "send_keys"
+        # Um paste parcial (ou que chegou atrasado) não pode sobrar no campo
+        _limpar_campo(campo)
+        if not _esperar_ate(driver, lambda d: not _texto_do_campo(d, campo), timeout=2):
+            _limpar_campo(campo)
+        _digitar_texto(campo, texto)
+
+
+def _digitar_texto(campo, texto: str) -> None:
+    """
+    Plano B: digita linha a linha com send_keys (Shift+Enter entre linhas,
+    para não enviar pedaços). Emojis fora do BMP são removidos aqui.
+    """
+    linhas = _remove_non_bmp(texto).split("\n")
+    for i, linha in enumerate(linhas):
+        if linha:
+            campo.send_keys(linha)
+        if i < len(linhas) - 1:
+            campo.send_keys(Keys.SHIFT, Keys.ENTER)
+
 
-    raise TimeoutException("Campo de mensagem não encontrado.")
+def _texto_do_campo(driver, campo) -> str:
+    try:
+        return driver.execute_script("return arguments[0].innerText || '';", campo).strip()
+    except WebDriverException:
+        return ""
+
+
+# ----------------------------------------------------------------------
+#   Status da mensagem enviada (relógio / ✓ / ✓✓)
+# ----------------------------------------------------------------------
+
+# Estados em que a mensagem já saiu do aparelho
+STATUS_CONFIRMADOS = {"enviada", "entregue", "lida"}
+
+
+@dataclass
+class ResultadoEnvio:
+    """Uma mensagem enviada: bolha na conversa e o último status visto."""
+    bolha_id: Optional[str]
+    status: str = "pendente"  # pendente | enviada | entregue | lida | falhou | desconhecido
+    segundos: float = 0.0
+    erro: Optional[str] = None
+
+    @property
+    def confirmado(self) -> bool:
+        return self.status in STATUS_CONFIRMADOS
+
+
+_JS_ULTIMA_BOLHA = """
+const bolhas = document.querySelectorAll('#main div.message-out');
+const ultima = bolhas.length ? bolhas[bolhas.length - 1].closest('[data-id]') : null;
+return ultima ? ultima.getAttribute('data-id') : null;
+"""
+
+# Observa (MutationObserver) os ícones de status das bolhas `ids` e só
+# responde quando nenhuma estiver mais no relógio, ou no timeout.
+_JS_ACOMPANHAR_BOLHAS = r"""
+const ids = arguments[0], timeoutMs = arguments[1];
+const done = arguments[arguments.length - 1];
+const ICONE = /^(?:msg|status)-(time|check|dblcheck(?:-ack)?|error|alert)/;
+
+function statusDe(id) {
+  const linha = [...document.querySelectorAll('[data-id]')].find((el) => el.getAttribute('data-id') === id);
+  if (!linha) return null;
+  for (const el of linha.querySelectorAll('span[data-icon]')) {
+    const m = (el.getAttribute('data-icon') || '').match(ICONE);
+    if (m) return m[1];
+  }
+  return '';
+}
+
+function estados() {
+  const r = {};
+  for (const id of ids) r[id] = statusDe(id);
+  return r;
+}
+
+let terminou = false, observer = null, intervalo = null, limite = null;
+function terminar() {
+  if (terminou) return;
+  terminou = true;
+  if (observer) observer.disconnect();
+  clearInterval(intervalo);
+  clearTimeout(limite);
+  done(estados());
+}
+function conferir() {
+  const r = estados();
+  if (Object.values(r).every((s) => s !== 'time')) terminar();
+}
+
+observer = new MutationObserver(conferir);
+observer.observe(document.querySelector('#main') || document.body,
+                 { subtree: true, childList: true, attributes: true, attributeFilter: ['data-icon'] });
+intervalo = setInterval(conferir, 500);
+limite = setTimeout(terminar, timeoutMs);
+conferir();
+"""
+
+_STATUS_DO_ICONE = {
+    "time": "pendente",
+    "check": "enviada",
+    "dblcheck": "entregue",
+    "dblcheck-ack": "lida",
+    "error": "falhou",
+    "alert": "falhou",
+}
+
+
+def _ultima_bolha(driver) -> Optional[str]:
+    try:
+        return driver.execute_script(_JS_ULTIMA_BOLHA)
+    except WebDriverException:
+        return None
 
 
-def enviar_mensagem(driver, mensagem: str):
+def acompanhar_entregas(driver, resultados: List[ResultadoEnvio],
+                        timeout: float = WPP_TIMEOUT_ENTREGA) -> List[ResultadoEnvio]:
     """
-    Envia uma mensagem na conversa já aberta.
+    Espera, numa única chamada de script, as bolhas pendentes saírem do
+    relógio e atualiza o status de cada ResultadoEnvio (na própria lista).
+    """
+    pendentes = [r for r in resultados if r.bolha_id and r.status == "pendente"]
+    if not pendentes:
+        return resultados
+    inicio = time.perf_counter()
+    with span("wpp.entrega", mensagens=len(pendentes)) as s:
+        try:
+            with _script_timeout(driver, timeout + 10):
+                estados = driver.execute_async_script(
+                    _JS_ACOMPANHAR_BOLHAS, [r.bolha_id for r in pendentes], int(timeout * 1000)
+                ) or {}
+        except WebDriverException as e:
+            _log(f"[WARN] Acompanhamento de entrega falhou: {type(e).__name__}")
+            estados = {}
+        decorrido = time.perf_counter() - inicio
+        for r in pendentes:
+            icone = estados.get(r.bolha_id)
+            r.status = _STATUS_DO_ICONE.get(icone, "desconhecido") if icone is not None else "desconhecido"
+            r.segundos = round(r.segundos + decorrido, 2)
+        s["confirmadas"] = sum(1 for r in pendentes if r.confirmado)
+    return resultados
+
+
+@traced("wpp.enviar")
+def enviar_mensagem(driver, mensagem: str, esperar_entrega: float = 0) -> ResultadoEnvio:
     """
-    from time import sleep
+    Envia uma mensagem na conversa já aberta e devolve um ResultadoEnvio.
 
+    Volta assim que o campo fica livre (status "pendente"), para o próximo
+    envio já começar; acompanhar_entregas confirma depois. Com
+    esperar_entrega > 0, espera aqui mesmo até esse tanto de segundos.
+    """
+    inicio = time.perf_counter()
     campo = _encontrar_campo_mensagem(driver)
 
-    # clica para focar
+    # clica para focar (e espera o foco de fato chegar no campo)
     campo.click()
-    sleep(0.5)
+    _esperar_ate(
+        driver,
+        lambda d: d.execute_script("return arguments[0].contains(document.activeElement);", campo),
+        timeout=5,
+    )
 
-    # digita a mensagem
-    campo.send_keys(mensagem)
-    sleep(0.5)
+    # cola a mensagem de uma vez; se o editor não aceitar, digita
+    _inserir_texto(driver, campo, mensagem)
+    _esperar_ate(driver, lambda d: bool(_texto_do_campo(d, campo)), timeout=5)
 
-    # ENTER para enviar
+    # ENTER para enviar; o campo esvaziar indica que a mensagem saiu do editor
+    anterior = _ultima_bolha(driver)
     campo.send_keys(Keys.ENTER)
-    print("[WPP] Mensagem enviada.")
+    if not _esperar_ate(driver, lambda d: not _texto_do_campo(d, campo), timeout=10):
+        _log("[WARN] O campo de mensagem não esvaziou depois do ENTER.")
+
+    resultado = _resultado_da_bolha_nova(driver, anterior, inicio, timeout=5, esperar_entrega=esperar_entrega)
+    print(f"[WPP] Mensagem enviada ({resultado.status}).")
+    return resultado
+
+
+def _resultado_da_bolha_nova(driver, anterior: Optional[str], inicio: float, timeout: float,
+                             esperar_entrega: float) -> ResultadoEnvio:
+    """A bolha nova (última de saída, diferente de `anterior`) é a do envio."""
+    bolha: Dict[str, Optional[str]] = {}
+
+    def _bolha_nova(d) -> bool:
+        bolha["id"] = _ultima_bolha(d)
+        return bool(bolha["id"]) and bolha["id"] != anterior
+
+    if not _esperar_ate(driver, _bolha_nova, timeout=timeout):
+        _log("[ERRO] Nenhuma bolha nova apareceu na conversa.")
+        return ResultadoEnvio(None, status="falhou", segundos=round(time.perf_counter() - inicio, 2),
+                              erro="mensagem não apareceu na conversa")
+
+    resultado = ResultadoEnvio(bolha["id"], segundos=round(time.perf_counter() - inicio, 2))
+    if esperar_entrega > 0:
+        acompanhar_entregas(driver, [resultado], timeout=esperar_entrega)
+    return resultado
+
+
+@traced("wpp.enviar_imagem")
+def enviar_imagem(driver, caminho_imagem: str, legenda: str = "",
+                  esperar_entrega: float = 0) -> ResultadoEnvio:
+    """
+    Envia uma imagem local (com legenda) na conversa já aberta, pelo menu
+    de anexos: o arquivo vai direto no <input type=file>, sem diálogo.
+    """
+    inicio = time.perf_counter()
+    caminho = str(Path(caminho_imagem).resolve())
+
+    anexar = _tentar_seletores(
+        driver,
+        [
+            "span[data-icon='plus-rounded']",
+            "span[data-icon='plus']",
+            "span[data-icon='attach-menu-plus']",
+            "div[title='Anexar']",
+            "button[title='Anexar']",
+            "span[data-icon='clip']",
+        ],
+        timeout_total=10,
+        cond=EC.element_to_be_clickable,
+        elemento="anexar",
+    )
+    if not anexar:
+        raise TimeoutException("Botão de anexo não encontrado.")
+    anexar.click()
+
+    entrada = _tentar_seletores(
+        driver,
+        ["input[type='file'][accept*='image']", "input[type='file']"],
+        timeout_total=10,
+        cond=EC.presence_of_element_located,
+        elemento="arquivo_imagem",
+    )
+    if not entrada:
+        raise TimeoutException("Campo de arquivo de imagem não encontrado.")
+    entrada.send_keys(caminho)
+
+    if legenda:
+        campo = _tentar_seletores(
+            driver,
+            [
+                "div[aria-label*='legenda'][contenteditable='true']",
+                "div[aria-label*='caption'][contenteditable='true']",
+                "div[role='dialog'] div[contenteditable='true']",
+            ],
+            timeout_total=15,
+            elemento="legenda",
+        )
+        if not campo:
+            raise TimeoutException("Campo de legenda não encontrado.")
+        _inserir_texto(driver, campo, legenda)
+
+    anterior = _ultima_bolha(driver)
+    botao = _obter_botao_enviar(driver)
+    if not botao:
+        raise TimeoutException("Botão de enviar imagem não encontrado.")
+    botao.click()
+
+    # Upload pode demorar mais que um texto para virar bolha
+    resultado = _resultado_da_bolha_nova(driver, anterior, inicio, timeout=30, esperar_entrega=esperar_entrega)
+    print(f"[WPP] Imagem enviada ({resultado.status}).")
+    return resultado
+
+
+def abrir_conversa_por_numero(driver, numero: str) -> None:
+    """Abre o chat de um número (com DDI) pelo link send?phone= do WhatsApp Web."""
+    numero = re.sub(r"\D", "", numero)
+    _log(f"Abrindo conversa com o número {numero}")
+    driver.get(f"{WPP_URL}send?phone={numero}")
+    campo = _tentar_seletores(
+        driver,
+        ["footer div[contenteditable='true'][data-tab='10']", "footer div[contenteditable='true']"],
+        timeout_total=60,
+        elemento="mensagem_rodape",
+    )
+    if not campo:
+        raise TimeoutException(f"Conversa com {numero} não abriu (número inválido ou sem login).")
+
+
+# ======================================================================
+#   SESSÃO PERSISTENTE (ABA PRÓPRIA)
+# ======================================================================
+
+@dataclass
+class EntregaConversa:
+    """Resultado do envio de um lote de mensagens para uma conversa."""
+    conversa: str
+    enviadas: int = 0    # confirmadas (✓, ✓✓ ou lidas)
+    pendentes: int = 0   # ainda no relógio quando o tempo de espera acabou
+    falhas: int = 0
+    erros: List[str] = field(default_factory=list)
+    segundos: float = 0.0
+    resultados: List[ResultadoEnvio] = field(default_factory=list)
+
+    @property
+    def ok(self) -> bool:
+        return self.falhas == 0 and self.pendentes == 0 and self.enviadas > 0
+
+
+class WhatsAppSession:
+    """
+    Mantém o WhatsApp Web aberto numa aba própria do Chrome (window handle
+    guardado), com a conversa já selecionada. Entre uma oferta e outra só
+    troca de aba: não recarrega web.whatsapp.com nem refaz a busca do chat
+    se ele continuar aberto. Para trocar de chat, usa primeiro a entrada da
+    barra lateral; a busca fica como plano B.
+    """
+
+    def __init__(self, driver, nome_conversa: Optional[str] = None):
+        self.driver = driver
+        self.nome_conversa = nome_conversa
+        self.numero: Optional[str] = None
+        self.aba: Optional[str] = None
+
+    def _aba_viva(self) -> bool:
+        if self.aba is None:
+            return False
+        try:
+            return self.aba in self.driver.window_handles
+        except Exception:
+            return False
+
+    def ativar(self) -> None:
+        """Vai para a aba do WhatsApp, abrindo-a (uma vez) se preciso."""
+        if self._aba_viva():
+            if self.driver.current_window_handle != self.aba:
+                self.driver.switch_to.window(self.aba)
+            if "web.whatsapp.com" in self.driver.current_url:
+                return
+        else:
+            self.driver.switch_to.new_window("tab")
+            self.aba = self.driver.current_window_handle
+        abrir_whatsapp(self.driver)
+
+    def selecionar(self, nome_conversa: Optional[str] = None) -> None:
+        nome = nome_conversa or self.nome_conversa
+        if not nome:
+            raise ValueError("Nenhuma conversa informada.")
+        self.ativar()
+        if not conversa_aberta(self.driver, nome) and not abrir_conversa_pela_lista(self.driver, nome):
+            try:
+                abrir_conversa(self.driver, nome)
+            finally:
+                _limpar_busca(self.driver)
+        # Melhor o lote falhar do que sair no chat errado
+        if not conversa_aberta(self.driver, nome):
+            self.nome_conversa = None
+            raise TimeoutException(f"A conversa aberta não é '{nome}'.")
+        self.nome_conversa, self.numero = nome, None
+
+    def selecionar_numero(self, numero: str) -> None:
+        """Deixa aberto o chat de um número; só recarrega se o número mudar."""
+        numero = re.sub(r"\D", "", numero)
+        if self._aba_viva():
+            if self.driver.current_window_handle != self.aba:
+                self.driver.switch_to.window(self.aba)
+            if self.numero == numero and "web.whatsapp.com" in self.driver.current_url:
+                return
+        else:
+            self.driver.switch_to.new_window("tab")
+            self.aba = self.driver.current_window_handle
+        abrir_conversa_por_numero(self.driver, numero)
+        self.numero, self.nome_conversa = numero, None
+
+    def enviar(self, mensagem: str, nome_conversa: Optional[str] = None,
+               esperar_entrega: float = WPP_TIMEOUT_ENTREGA) -> ResultadoEnvio:
+        self.selecionar(nome_conversa)
+        return enviar_mensagem(self.driver, mensagem, esperar_entrega=esperar_entrega)
+
+    def enviar_para_varias(self, conversas: List[str], mensagens: List[str]) -> List[EntregaConversa]:
+        """
+        Fan-out: para cada conversa, abre o chat uma vez e manda o lote
+        inteiro em sequência, cada envio logo que o campo fica livre. As
+        confirmações (✓/✓✓) do lote são esperadas juntas, antes de trocar de
+        chat. Devolve o relatório de entrega por conversa.
+        """
+        relatorio: List[EntregaConversa] = []
+        for nome in conversas:
+            entrega = EntregaConversa(nome)
+            inicio = time.perf_counter()
+            with span("wpp.lote", conversa=nome, mensagens=len(mensagens)):
+                try:
+                    self.selecionar(nome)
+                except Exception as e:
+                    entrega.falhas = len(mensagens)
+                    entrega.erros.append(f"abrir conversa: {e}")
+                else:
+                    for mensagem in mensagens:
+                        try:
+                            if not conversa_aberta(self.driver, nome):
+                                # Trocar de chat tira as bolhas anteriores da tela
+                                acompanhar_entregas(self.driver, entrega.resultados)
+                                self.selecionar(nome)
+                            entrega.resultados.append(enviar_mensagem(self.driver, mensagem))
+                        except Exception as e:
+                            entrega.resultados.append(ResultadoEnvio(None, status="falhou", erro=str(e)))
+                    acompanhar_entregas(self.driver, entrega.resultados)
+
+                    for r in entrega.resultados:
+                        if r.confirmado:
+                            entrega.enviadas += 1
+                        elif r.status in ("pendente", "desconhecido"):
+                            entrega.pendentes += 1
+                        else:
+                            entrega.falhas += 1
+                            entrega.erros.append(r.erro or r.status)
+            entrega.segundos = round(time.perf_counter() - inicio, 2)
+            _log(f"'{nome}': {entrega.enviadas}/{len(mensagens)} confirmadas, "
+                 f"{entrega.pendentes} pendente(s) em {entrega.segundos}s")
+            relatorio.append(entrega)
+        return relatorio
+
+    def close(self) -> None:
+        """Fecha só a aba do WhatsApp (o Chrome de debug continua aberto)."""
+        if self._aba_viva():
+            try:
+                self.driver.switch_to.window(self.aba)
+                self.driver.close()
+                self.driver.switch_to.window(self.driver.window_handles[0])
+            except Exception:
+                pass
+        self.aba = None
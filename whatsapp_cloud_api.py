@@ -1,5 +1,7 @@
-import requests
 import json
+import os
+
+import http_client
 
 # ====================================
 # CONFIGURAÇÃO - EDITE ESTES CAMPOS
@@ -16,6 +18,9 @@ PHONE_NUMBER_ID = "868762336321984"
 # Formato: DDI + DDD + número, sem + e sem espaços
 DESTINO_PADRAO = "5541999124817"
 
+# Base da Graph API (trocável para apontar para um servidor local de testes)
+GRAPH_API_BASE = os.getenv("WHATSAPP_GRAPH_BASE", "https://graph.facebook.com")
+
 
 # ====================================
 # FUNÇÕES DE ENVIO
@@ -26,7 +31,7 @@ def enviar_whatsapp_texto(mensagem: str, numero_destino: str = None):
     if numero_destino is None:
         numero_destino = DESTINO_PADRAO
 
-    url = f"https://graph.facebook.com/v19.0/{PHONE_NUMBER_ID}/messages"
+    url = f"{GRAPH_API_BASE}/v19.0/{PHONE_NUMBER_ID}/messages"
 
     headers = {
         "Authorization": f"Bearer {WHATSAPP_TOKEN}",
@@ -40,7 +45,7 @@ def enviar_whatsapp_texto(mensagem: str, numero_destino: str = None):
         "text": {"body": mensagem}
     }
 
-    resp = requests.post(url, headers=headers, data=json.dumps(payload))
+    resp = http_client.post(url, headers=headers, data=json.dumps(payload))
     print("[WHATSAPP][TEXTO]", resp.status_code, resp.text)
     return resp
 
@@ -50,7 +55,7 @@ def enviar_whatsapp_imagem(img_url: str, legenda: str, numero_destino: str = Non
     if numero_destino is None:
         numero_destino = DESTINO_PADRAO
 
-    url = f"https://graph.facebook.com/v19.0/{PHONE_NUMBER_ID}/messages"
+    url = f"{GRAPH_API_BASE}/v19.0/{PHONE_NUMBER_ID}/messages"
 
     headers = {
         "Authorization": f"Bearer {WHATSAPP_TOKEN}",
@@ -67,7 +72,7 @@ def enviar_whatsapp_imagem(img_url: str, legenda: str, numero_destino: str = Non
         }
     }
 
-    resp = requests.post(url, headers=headers, data=json.dumps(payload))
+    resp = http_client.post(url, headers=headers, data=json.dumps(payload))
     print("[WHATSAPP][IMAGEM]", resp.status_code, resp.text)
     return resp
 